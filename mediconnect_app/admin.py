@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import (
-    CustomUser, DoctorProfile, PatientProfile, MedicalForm,
-    MedicalRecord, Appointment, Checkup, Prescription, Medication
+    CustomUser, DoctorProfile, PatientProfile, MedicalForm, MedicalTag,
+    MedicalRecord, Appointment, Checkup, Prescription, Medication,
+    DoctorSchedule, ScheduleInterval, DoctorDailyStats
 )
 
 
@@ -30,6 +31,7 @@ class CustomUserAdmin(UserAdmin):
 @admin.register(DoctorProfile)
 class DoctorProfileAdmin(admin.ModelAdmin):
     list_display = ('get_full_name', 'specialization', 'phone', 'license_number')
+    list_select_related = ('user',)
     search_fields = ('user__first_name', 'user__last_name', 'specialization')
     list_filter = ('specialization', 'years_of_experience')
     
@@ -38,9 +40,49 @@ class DoctorProfileAdmin(admin.ModelAdmin):
     get_full_name.short_description = 'Doctor'
 
 
+class ScheduleIntervalInline(admin.TabularInline):
+    model = ScheduleInterval
+    extra = 0
+
+
+@admin.register(DoctorSchedule)
+class DoctorScheduleAdmin(admin.ModelAdmin):
+    list_display = ('get_doctor_name', 'slot_minutes', 'updated_at')
+    list_select_related = ('doctor__user',)
+    search_fields = ('doctor__user__first_name', 'doctor__user__last_name')
+    readonly_fields = ('slot_templates', 'updated_at')
+    inlines = [ScheduleIntervalInline]
+    
+    def get_doctor_name(self, obj):
+        return f"{obj.doctor.user.first_name} {obj.doctor.user.last_name}"
+    get_doctor_name.short_description = 'Doctor'
+
+
+@admin.register(DoctorDailyStats)
+class DoctorDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('get_doctor_name', 'day', 'scheduled', 'confirmed', 'in_progress', 'completed',
+                    'cancelled', 'prescriptions', 'new_patients')
+    search_fields = ('doctor__user__first_name', 'doctor__user__last_name')
+    list_filter = ('day',)
+    list_select_related = ('doctor__user',)
+    date_hierarchy = 'day'
+    
+    # Maintained by signals; fix drift with the rebuild_doctor_daily_stats command
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_doctor_name(self, obj):
+        return f"{obj.doctor.user.first_name} {obj.doctor.user.last_name}"
+    get_doctor_name.short_description = 'Doctor'
+
+
 @admin.register(PatientProfile)
 class PatientProfileAdmin(admin.ModelAdmin):
     list_display = ('get_full_name', 'phone', 'gender', 'city', 'country')
+    list_select_related = ('user',)
     search_fields = ('user__first_name', 'user__last_name', 'city')
     list_filter = ('gender', 'city', 'country')
     
@@ -52,17 +94,27 @@ class PatientProfileAdmin(admin.ModelAdmin):
 @admin.register(MedicalForm)
 class MedicalFormAdmin(admin.ModelAdmin):
     list_display = ('get_patient_name', 'has_chronic_diseases', 'has_allergies')
+    list_select_related = ('patient__user',)
     search_fields = ('patient__user__first_name', 'patient__user__last_name')
-    list_filter = ('has_chronic_diseases', 'has_allergies', 'has_family_history')
+    list_filter = ('has_chronic_diseases', 'has_allergies', 'has_family_history', 'tags')
+    filter_horizontal = ('tags',)
     
     def get_patient_name(self, obj):
         return f"{obj.patient.user.first_name} {obj.patient.user.last_name}"
     get_patient_name.short_description = 'Patient'
 
 
+@admin.register(MedicalTag)
+class MedicalTagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'category')
+    list_filter = ('category',)
+    search_fields = ('name',)
+
+
 @admin.register(MedicalRecord)
 class MedicalRecordAdmin(admin.ModelAdmin):
     list_display = ('get_patient_name', 'description', 'uploaded_at')
+    list_select_related = ('patient__user',)
     search_fields = ('patient__user__first_name', 'patient__user__last_name')
     list_filter = ('uploaded_at',)
     readonly_fields = ('uploaded_at',)
@@ -75,6 +127,7 @@ class MedicalRecordAdmin(admin.ModelAdmin):
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('get_patient_name', 'get_doctor_name', 'date', 'time', 'status')
+    list_select_related = ('patient__user', 'doctor__user')
     search_fields = ('patient__user__first_name', 'doctor__user__first_name')
     list_filter = ('status', 'date')
     readonly_fields = ('created_at',)
@@ -92,6 +145,7 @@ class AppointmentAdmin(admin.ModelAdmin):
 @admin.register(Checkup)
 class CheckupAdmin(admin.ModelAdmin):
     list_display = ('get_patient_name', 'get_doctor_name', 'created_at', 'get_bmi_category')
+    list_select_related = ('patient__user', 'doctor__user')
     search_fields = ('patient__user__first_name', 'doctor__user__first_name')
     list_filter = ('created_at',)
     readonly_fields = ('created_at', 'updated_at')
@@ -109,6 +163,7 @@ class CheckupAdmin(admin.ModelAdmin):
 @admin.register(Prescription)
 class PrescriptionAdmin(admin.ModelAdmin):
     list_display = ('medication_name', 'get_patient_name', 'get_doctor_name', 'created_at')
+    list_select_related = ('patient__user', 'doctor__user')
     search_fields = ('medication_name', 'patient__user__first_name', 'doctor__user__first_name')
     list_filter = ('created_at',)
     readonly_fields = ('created_at',)
@@ -126,6 +181,7 @@ class PrescriptionAdmin(admin.ModelAdmin):
 @admin.register(Medication)
 class MedicationAdmin(admin.ModelAdmin):
     list_display = ('medication_name', 'get_patient_name', 'status', 'start_date')
+    list_select_related = ('patient__user',)
     search_fields = ('medication_name', 'patient__user__first_name')
     list_filter = ('status', 'start_date')
     readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,100 @@
+"""
+Doctor availability with a cache of booked times per doctor and date.
+
+What is cached is the set of taken 'HH:MM' times for one doctor on one date,
+the only part that needs the database. Free slots are that set subtracted from
+the doctor's precomputed weekly template, so schedule edits apply immediately.
+Entries are keyed by a per-(doctor, date) version token, which the Appointment
+signals in signals.py replace whenever an appointment enters, leaves or moves
+within the scheduled/confirmed set. A reader that loaded the rows before the
+change committed then stores them under a version nobody reads any more, so a
+stale entry is never served. Queryset.update() bypasses those signals; call
+invalidate_availability() after bulk updates.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Appointment
+from .scheduling import DEFAULT_SLOT_TEMPLATES
+
+ACTIVE_STATUSES = Appointment.ACTIVE_STATUSES
+
+# Safety net only; invalidation is signal driven
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+
+
+def _version_key(doctor_id, day):
+    return f'availability-version:{doctor_id}:{day}'
+
+
+def _availability_versions(doctor_id, dates):
+    """{date: version token}, creating tokens for dates that have none."""
+    version_keys = {_version_key(doctor_id, day): day for day in dates}
+    versions = {version_keys[key]: version for key, version in cache.get_many(version_keys).items()}
+    for key, day in version_keys.items():
+        if day not in versions:
+            # A fresh random token, so an evicted version never revives an old entry
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[day] = cache.get(key)
+    return versions
+
+
+def availability_cache_key(doctor_id, day, version):
+    return f'availability:{doctor_id}:{day}:{version}'
+
+
+def get_booked_times(doctor_id, dates):
+    """{date: set of taken 'HH:MM'} for the dates, reading through the cache."""
+    # Versions are read before the rows, so a booking committed meanwhile lands under a key nobody reads
+    versions = _availability_versions(doctor_id, dates)
+    keys = {availability_cache_key(doctor_id, day, versions[day]): day for day in dates}
+    cached = cache.get_many(keys)
+    booked = {keys[key]: set(times) for key, times in cached.items()}
+
+    missing = [day for day in dates if day not in booked]
+    if missing:
+        fetched = {day: set() for day in missing}
+        rows = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            date__range=(min(missing), max(missing)),
+            status__in=ACTIVE_STATUSES
+        ).values_list('date', 'time')
+        for appointment_date, appointment_time in rows:
+            if appointment_date in fetched:
+                fetched[appointment_date].add(appointment_time.strftime('%H:%M'))
+        cache.set_many(
+            {availability_cache_key(doctor_id, day, versions[day]): sorted(times) for day, times in fetched.items()},
+            AVAILABILITY_CACHE_TIMEOUT
+        )
+        booked.update(fetched)
+
+    return booked
+
+
+def get_available_slots(doctor, dates):
+    """
+    Free slot strings ('HH:MM') for each of the given dates, from the doctor's
+    precomputed weekly templates minus the (cached) booked times.
+    """
+    if not dates:
+        return {}
+
+    schedule = getattr(doctor, 'schedule', None)
+    templates = schedule.slot_templates if schedule else DEFAULT_SLOT_TEMPLATES
+    booked = get_booked_times(doctor.pk, dates)
+
+    return {
+        day: [slot for slot in templates.get(str(day.weekday()), []) if slot not in booked[day]]
+        for day in dates
+    }
+
+
+def invalidate_availability(doctor_id, day):
+    def bump():
+        cache.set(_version_key(doctor_id, day), uuid.uuid4().hex, None)
+
+    bump()
+    # Again after commit, in case a request cached the uncommitted state in between
+    transaction.on_commit(bump)
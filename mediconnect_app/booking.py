@@ -0,0 +1,53 @@
+"""
+Atomic appointment booking.
+
+One active (scheduled/confirmed) appointment per doctor slot is enforced by
+the unique_active_doctor_slot partial unique index, not by a lock: each
+booking is a single INSERT inside a savepoint and the database rejects the
+losers of a race. Bookings for different slots never wait on each other.
+"""
+from django.db import IntegrityError, transaction
+
+from .models import SLOT_TAKEN_MESSAGE, Appointment
+
+
+class SlotTaken(Exception):
+    """The requested doctor slot already has an active appointment."""
+
+
+def book_slot(patient, doctor, date, time, reason='', status='scheduled'):
+    """
+    Create an appointment for the slot or raise SlotTaken.
+    Safe to call inside an outer transaction: only the savepoint is rolled back.
+    """
+    try:
+        with transaction.atomic():
+            return Appointment.objects.create(
+                patient=patient, doctor=doctor, date=date, time=time,
+                reason=reason, status=status
+            )
+    except IntegrityError as e:
+        # unique_active_doctor_slot means the slot can't be had; anything else
+        # (e.g. a missing foreign key) is a real error
+        if Appointment.objects.filter(
+            doctor=doctor, date=date, time=time, status__in=Appointment.ACTIVE_STATUSES
+        ).exists():
+            raise SlotTaken(f"{doctor} is already booked on {date} at {time}") from e
+        raise
+
+
+def save_appointment(appointment, **kwargs):
+    """
+    Save changes to an existing appointment or raise SlotTaken, when moving it
+    back into the active set collides with another booking of its slot.
+    """
+    try:
+        with transaction.atomic():
+            appointment.save(**kwargs)
+    except IntegrityError as e:
+        if Appointment.objects.filter(
+            doctor_id=appointment.doctor_id, date=appointment.date, time=appointment.time,
+            status__in=Appointment.ACTIVE_STATUSES
+        ).exclude(pk=appointment.pk).exists():
+            raise SlotTaken(f"{appointment.doctor} is already booked on {appointment.date} at {appointment.time}") from e
+        raise
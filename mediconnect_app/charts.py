@@ -0,0 +1,94 @@
+"""
+The patient chart a doctor sees on doctor_patient_detail.
+
+load_patient_chart() gathers the medical form summary, uploaded records and
+the doctor's checkups with their lab tests and prescriptions in five queries
+(form tags, records, checkups, lab tests, prescriptions); the medical form
+comes joined onto the patient. The assembled chart is cached per (patient,
+doctor) under a per-patient version token. Any change to a row shown on a
+chart replaces the token (signals.py), which orphans every doctor's cached
+chart for that patient at once without having to know which doctors have one.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .models import Checkup, LabTest, MedicalTag, Prescription
+
+CHART_CACHE_TIMEOUT = 300
+
+
+def medical_form_summary(medical_form):
+    """The medical form with its checklist tags as lists of names, or None."""
+    if not medical_form:
+        return None
+    tags = medical_form.tag_names()
+    return {
+        'has_chronic_diseases': medical_form.has_chronic_diseases,
+        'chronic_diseases': tags[MedicalTag.CHRONIC_DISEASE],
+        'has_allergies': medical_form.has_allergies,
+        'allergies': medical_form.allergies,
+        'vaccines': tags[MedicalTag.VACCINE],
+        'has_family_history': medical_form.has_family_history,
+        'family_history': tags[MedicalTag.FAMILY_HISTORY],
+    }
+
+
+def _version_key(patient_id):
+    return f'patient-chart-version:{patient_id}'
+
+
+def _chart_version(patient_id):
+    key = _version_key(patient_id)
+    version = cache.get(key)
+    if version is None:
+        # A fresh random token, so an evicted version never revives an old chart
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def patient_chart_cache_key(patient_id, doctor_id, version):
+    return f'patient-chart:{patient_id}:{doctor_id}:{version}'
+
+
+def build_patient_chart(patient, doctor):
+    """The chart from the database. `patient` should come with select_related('medical_form')."""
+    checkups = list(
+        Checkup.objects.filter(patient=patient, doctor=doctor).order_by('-created_at').prefetch_related(
+            Prefetch('lab_tests', queryset=LabTest.objects.order_by('created_at')),
+            Prefetch('prescriptions', queryset=Prescription.objects.order_by('-created_at')),
+        )
+    )
+    prescriptions = sorted(
+        (prescription for checkup in checkups for prescription in checkup.prescriptions.all()),
+        key=lambda prescription: prescription.created_at, reverse=True
+    )
+    return {
+        'medical_form': medical_form_summary(getattr(patient, 'medical_form', None)),
+        'medical_records': list(patient.medical_records.all()),
+        'checkups': checkups,
+        'prescriptions': prescriptions,
+    }
+
+
+def load_patient_chart(patient, doctor):
+    """The chart for `doctor`, read through the cache."""
+    # Read the version before building, so a change made meanwhile lands under a key nobody reads
+    key = patient_chart_cache_key(patient.pk, doctor.pk, _chart_version(patient.pk))
+    chart = cache.get(key)
+    if chart is None:
+        chart = build_patient_chart(patient, doctor)
+        cache.set(key, chart, CHART_CACHE_TIMEOUT)
+    return chart
+
+
+def invalidate_patient_chart(patient_id):
+    def bump():
+        cache.set(_version_key(patient_id), uuid.uuid4().hex, None)
+
+    bump()
+    # Again after commit, in case a request cached the uncommitted state in between
+    transaction.on_commit(bump)
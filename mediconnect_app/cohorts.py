@@ -0,0 +1,196 @@
+"""
+Patient cohorts for public-health questions, compiled to a single query.
+
+A cohort spec is a JSON-style dict; every key narrows the cohort:
+
+    {
+        "city": "Paris",                                # also "country", "gender"
+        "age": {"min": 40, "max": 64},
+        "chronic_diseases": {"all": ["Hypertension"]},  # also "vaccines", "family_history"
+        "vaccines": {"none": ["Influenza"]},
+        "latest_checkup": {"blood_pressure_systolic": {"gt": 140}, "predicted_disease": {"contains": "hypert"}}
+    }
+
+Tag keys take {"all"|"any"|"none": [names]}, or a plain list for "all"; each
+becomes an EXISTS on the medical form tags (patients.has_medical_tag). Checkup
+conditions are {operator: value} with the operators in OPERATORS, or a bare
+value for equality. They apply to each patient's most recent checkup, picked
+by a correlated subquery, so patients with no checkup never match them.
+
+compile_cohort() returns the PatientProfile queryset; nothing runs until it
+is iterated. cohort_patient_ids() streams the matching ids from that one
+SELECT with iterator(), in primary-key order.
+"""
+import math
+
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, FloatField, IntegerField, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Checkup, MedicalTag, PatientProfile
+from .patients import has_medical_tag, years_before
+
+# Spec key -> PatientProfile lookup
+PATIENT_FIELDS = {
+    'city': 'city__iexact',
+    'country': 'country__iexact',
+    'gender': 'gender',
+}
+
+# Spec key -> MedicalTag category
+TAG_CATEGORIES = {
+    'chronic_diseases': MedicalTag.CHRONIC_DISEASE,
+    'vaccines': MedicalTag.VACCINE,
+    'family_history': MedicalTag.FAMILY_HISTORY,
+}
+TAG_MODES = ('all', 'any', 'none')
+
+CHECKUP_FIELDS = (
+    'heart_rate', 'blood_pressure_systolic', 'blood_pressure_diastolic', 'temperature', 'oxygen_saturation',
+    'weight', 'height', 'diagnosis', 'predicted_disease',
+)
+
+# Spec operator -> Django lookup
+OPERATORS = {
+    'eq': 'exact',
+    'lt': 'lt',
+    'lte': 'lte',
+    'gt': 'gt',
+    'gte': 'gte',
+    'in': 'in',
+    'contains': 'icontains',
+}
+
+SPEC_KEYS = {*PATIENT_FIELDS, 'age', *TAG_CATEGORIES, 'latest_checkup'}
+
+MAX_AGE = 150
+# Numbers must fit the database's 64-bit integer columns
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+
+class CohortSpecError(ValueError):
+    """A cohort spec that can't be compiled; the message names the offending part."""
+
+
+def _age_filters(value, today):
+    if not isinstance(value, dict) or not value or set(value) - {'min', 'max'}:
+        raise CohortSpecError('age takes {"min": years, "max": years}')
+    if not all(
+        isinstance(years, int) and not isinstance(years, bool) and 0 <= years <= MAX_AGE for years in value.values()
+    ):
+        raise CohortSpecError(f'age bounds must be whole numbers of years from 0 to {MAX_AGE}')
+
+    # Ages become date_of_birth ranges, as in the patient list's age bands
+    filters = {}
+    if 'min' in value:
+        filters['date_of_birth__lte'] = years_before(today, value['min'])
+    if 'max' in value:
+        filters['date_of_birth__gt'] = years_before(today, value['max'] + 1)
+    return filters
+
+
+def _tag_conditions(key, value):
+    category = TAG_CATEGORIES[key]
+    if isinstance(value, list):
+        value = {'all': value}
+    if not isinstance(value, dict) or not value or set(value) - set(TAG_MODES):
+        raise CohortSpecError(f'{key} takes a list of names or {{"all"|"any"|"none": [names]}}')
+
+    conditions = []
+    for mode, names in value.items():
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise CohortSpecError(f'{key}.{mode} must be a list of names')
+        if not names:
+            continue
+        if mode == 'all':
+            conditions.extend(has_medical_tag(category, name) for name in names)
+        elif mode == 'any':
+            conditions.append(has_medical_tag(category, *names))
+        else:
+            conditions.append(~has_medical_tag(category, *names))
+    return conditions
+
+
+def _check_operand(field, operand):
+    """Reject operands the field's column can't be compared with; None is left to the lookup."""
+    if operand is None:
+        return
+    model_field = Checkup._meta.get_field(field)
+    if not isinstance(model_field, (IntegerField, FloatField)):
+        if not isinstance(operand, str):
+            raise CohortSpecError(f'latest_checkup.{field} takes text')
+        return
+
+    if isinstance(operand, bool) or not isinstance(operand, (int, float)):
+        raise CohortSpecError(f'latest_checkup.{field} takes numbers')
+    if isinstance(operand, float) and not math.isfinite(operand):
+        raise CohortSpecError(f'latest_checkup.{field}: numbers must be finite')
+    # Integer columns turn float operands into ints too
+    if (isinstance(operand, int) or isinstance(model_field, IntegerField)) and not MIN_INTEGER <= operand <= MAX_INTEGER:
+        raise CohortSpecError(f'latest_checkup.{field}: {operand} is out of range')
+
+
+def _checkup_lookups(value):
+    if not isinstance(value, dict) or not value:
+        raise CohortSpecError('latest_checkup takes {field: {operator: value}}')
+
+    lookups = {}
+    for field, condition in value.items():
+        if field not in CHECKUP_FIELDS:
+            raise CohortSpecError(f"latest_checkup.{field} is not one of {', '.join(CHECKUP_FIELDS)}")
+        if not isinstance(condition, dict):
+            condition = {'eq': condition}
+        for operator, operand in condition.items():
+            if operator not in OPERATORS:
+                raise CohortSpecError(
+                    f"latest_checkup.{field}: operator {operator!r} is not one of {', '.join(OPERATORS)}"
+                )
+            if (operator == 'in') != isinstance(operand, list):
+                raise CohortSpecError(f'latest_checkup.{field}: only "in" takes a list')
+            for item in operand if operator == 'in' else [operand]:
+                _check_operand(field, item)
+            lookups[f'{field}__{OPERATORS[operator]}'] = operand
+    return lookups
+
+
+def compile_cohort(spec, today=None):
+    """The PatientProfile queryset matching `spec`, as one SELECT. Raises CohortSpecError."""
+    if not isinstance(spec, dict):
+        raise CohortSpecError('A cohort spec is a JSON object')
+    unknown = set(spec) - SPEC_KEYS
+    if unknown:
+        raise CohortSpecError(f"Unknown spec keys: {', '.join(sorted(unknown))}")
+    today = today or timezone.localdate()
+
+    filters = {}
+    for key, lookup in PATIENT_FIELDS.items():
+        if key in spec:
+            if not isinstance(spec[key], str):
+                raise CohortSpecError(f'{key} must be a string')
+            filters[lookup] = spec[key]
+    if 'age' in spec:
+        filters.update(_age_filters(spec['age'], today))
+
+    conditions = []
+    for key in TAG_CATEGORIES:
+        if key in spec:
+            conditions.extend(_tag_conditions(key, spec[key]))
+
+    patients = PatientProfile.objects.all()
+    if 'latest_checkup' in spec:
+        lookups = _checkup_lookups(spec['latest_checkup'])
+        latest = Checkup.objects.filter(patient=OuterRef('pk')).order_by('-created_at', '-id').values('pk')[:1]
+        patients = patients.alias(latest_checkup_id=Subquery(latest))
+        try:
+            matching_checkup = Checkup.objects.filter(pk=OuterRef('latest_checkup_id'), **lookups)
+        except (TypeError, ValueError, ValidationError) as error:
+            raise CohortSpecError(f'latest_checkup: {error}') from error
+        conditions.append(Exists(matching_checkup))
+
+    # Plain column tests first, so the correlated subqueries only run for rows that pass them
+    return patients.filter(**filters).filter(*conditions).order_by('pk')
+
+
+def cohort_patient_ids(spec, today=None, chunk_size=2000):
+    """Ids of the patients matching `spec` in pk order, streamed from one query."""
+    return compile_cohort(spec, today).values_list('pk', flat=True).iterator(chunk_size=chunk_size)
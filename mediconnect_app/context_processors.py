@@ -0,0 +1,6 @@
+from .live import live_messages_enabled
+
+
+def live_messages(request):
+    """`live_messages`: whether base.html should open the live message stream."""
+    return {'live_messages': live_messages_enabled(request)}
@@ -0,0 +1,188 @@
+"""
+Doctor dashboard counters and the DoctorDailyStats rollup behind them.
+
+DoctorDailyStats rows are adjusted in place by the Appointment and
+Prescription signals in signals.py: every change is applied as +/- deltas
+with F() updates, so no write ever rescans history. rebuild_daily_stats()
+recomputes them from scratch for repair (manage.py rebuild_doctor_daily_stats).
+Queryset.update() and bulk writes bypass the signals and need a rebuild.
+
+The dashboard reads its counters from the rollup with one aggregate and caches
+the result per doctor for a short time; the same signals drop that entry.
+"""
+import threading
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Appointment, DoctorDailyStats, Prescription
+
+DOCTOR_STATS_CACHE_TIMEOUT = 60
+
+# Statuses still to be seen today: booked, or with the doctor right now
+REMAINING_STATUSES = Appointment.ACTIVE_STATUSES + ('in_progress',)
+
+
+def doctor_stats_cache_key(doctor_id):
+    return f'doctor-dashboard-stats:{doctor_id}'
+
+
+def compute_doctor_stats(doctor, today):
+    """Dashboard counters from the rollup: one aggregate over the doctor's daily rows."""
+    def today_sum(*fields):
+        total = F(fields[0])
+        for field in fields[1:]:
+            total += F(field)
+        return Sum(total, filter=Q(day=today), default=0)
+
+    return DoctorDailyStats.objects.filter(doctor=doctor).aggregate(
+        total_patients=Sum('new_patients', default=0),
+        today_appointments_count=today_sum('scheduled', 'confirmed', 'in_progress', 'completed'),
+        completed_today=today_sum('completed'),
+        remaining_today=today_sum(*REMAINING_STATUSES),
+        pending_prescriptions=today_sum('prescriptions'),
+    )
+
+
+def get_doctor_stats(doctor, today):
+    """Dashboard counters for `today`, read through the cache."""
+    key = doctor_stats_cache_key(doctor.pk)
+    cached = cache.get(key)
+    # Entries carry their date so yesterday's counters are never served after midnight
+    if cached is not None and cached['date'] == today:
+        return cached['stats']
+
+    stats = compute_doctor_stats(doctor, today)
+    cache.set(key, {'date': today, 'stats': stats}, DOCTOR_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_doctor_stats(doctor_id):
+    key = doctor_stats_cache_key(doctor_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+# Rollup maintenance
+
+def _apply_deltas(deltas, create=True):
+    """
+    Add {(doctor_id, day): Counter(field=delta)} to the rollup. Rows are only
+    created when `create` is set; deletions never create rows, which keeps
+    cascading doctor deletes from resurrecting stats for a doctor being removed.
+    """
+    for (doctor_id, day), counts in deltas.items():
+        counts = {field: delta for field, delta in counts.items() if delta}
+        if not counts:
+            continue
+        changes = {field: F(field) + delta for field, delta in counts.items()}
+        rows = DoctorDailyStats.objects.filter(doctor_id=doctor_id, day=day)
+        if not rows.update(**changes) and create:
+            DoctorDailyStats.objects.get_or_create(doctor_id=doctor_id, day=day)
+            rows.update(**changes)
+
+
+def _first_visit(doctor_id, patient_id, exclude_pk=None):
+    return Appointment.objects.filter(
+        doctor_id=doctor_id, patient_id=patient_id
+    ).exclude(pk=exclude_pk).aggregate(first=Min('date'))['first']
+
+
+# new_patients is credited to each (doctor, patient) pair's first appointment date.
+# The first date is read before a write and compared after it; pending holds the
+# "before" per pair, per thread, so a cascade deleting several appointments of one
+# pair is settled once, after the whole batch is gone.
+_first_visits = threading.local()
+
+
+def note_first_visit(doctor_id, patient_id, replace=True, exclude_pk=None):
+    """
+    Remember the pair's first appointment date before a write that may move it.
+    For an insert, call it afterwards with exclude_pk: reading before the INSERT
+    would make SQLite upgrade a read transaction and fail under concurrent bookings.
+    """
+    pending = _first_visits.__dict__.setdefault('pending', {})
+    if replace or (doctor_id, patient_id) not in pending:
+        pending[(doctor_id, patient_id)] = _first_visit(doctor_id, patient_id, exclude_pk)
+
+
+def settle_first_visit(doctor_id, patient_id, create=True):
+    """Move the pair's new_patients credit if the write changed its first date."""
+    pending = _first_visits.__dict__.setdefault('pending', {})
+    if (doctor_id, patient_id) not in pending:
+        return
+    before = pending.pop((doctor_id, patient_id))
+    after = _first_visit(doctor_id, patient_id)
+    if before == after:
+        return
+    deltas = defaultdict(Counter)
+    if before is not None:
+        deltas[(doctor_id, before)]['new_patients'] -= 1
+    if after is not None:
+        deltas[(doctor_id, after)]['new_patients'] += 1
+    _apply_deltas(deltas, create=create)
+
+
+def record_status_change(old, new):
+    """
+    Move one appointment between (doctor_id, date, status) counters; either
+    side may be None for a creation or a deletion.
+    """
+    deltas = defaultdict(Counter)
+    if old is not None:
+        doctor_id, day, status = old
+        deltas[(doctor_id, day)][status] -= 1
+    if new is not None:
+        doctor_id, day, status = new
+        deltas[(doctor_id, day)][status] += 1
+    _apply_deltas(deltas, create=new is not None)
+
+
+def record_prescription(prescription, delta):
+    # Same day boundary as TruncDate in rebuild_daily_stats: the current time zone
+    day = timezone.localdate(prescription.created_at)
+    _apply_deltas({(prescription.doctor_id, day): Counter(prescriptions=delta)}, create=delta > 0)
+
+
+def rebuild_daily_stats(doctor_ids=None, batch_size=1000):
+    """Recompute the rollup from Appointment and Prescription; returns the row count."""
+    appointments = Appointment.objects.all()
+    prescriptions = Prescription.objects.all()
+    existing = DoctorDailyStats.objects.all()
+    if doctor_ids is not None:
+        appointments = appointments.filter(doctor_id__in=doctor_ids)
+        prescriptions = prescriptions.filter(doctor_id__in=doctor_ids)
+        existing = existing.filter(doctor_id__in=doctor_ids)
+
+    rows = defaultdict(Counter)
+    for row in appointments.values('doctor_id', 'date', 'status').annotate(n=Count('id')).order_by():
+        rows[(row['doctor_id'], row['date'])][row['status']] += row['n']
+    first_visits = appointments.values('doctor_id', 'patient_id').annotate(first=Min('date')).order_by()
+    for row in first_visits.iterator():
+        rows[(row['doctor_id'], row['first'])]['new_patients'] += 1
+    by_day = prescriptions.annotate(day=TruncDate('created_at')).values('doctor_id', 'day').annotate(n=Count('id')).order_by()
+    for row in by_day:
+        rows[(row['doctor_id'], row['day'])]['prescriptions'] += row['n']
+
+    with transaction.atomic():
+        existing.delete()
+        DoctorDailyStats.objects.bulk_create(
+            [DoctorDailyStats(doctor_id=doctor_id, day=day, **counts) for (doctor_id, day), counts in rows.items()],
+            batch_size=batch_size
+        )
+    return len(rows)
+
+
+def daily_stats_report(start, end, doctor_ids=None):
+    """Per doctor totals over [start, end] from the rollup, without touching history."""
+    rows = DoctorDailyStats.objects.filter(day__range=(start, end))
+    if doctor_ids is not None:
+        rows = rows.filter(doctor_id__in=doctor_ids)
+    fields = [status for status, _label in Appointment.STATUS_CHOICES] + ['prescriptions', 'new_patients']
+    return rows.values('doctor_id').annotate(
+        days=Count('id'), **{field: Sum(field) for field in fields}
+    ).order_by('doctor_id')
@@ -0,0 +1,212 @@
+"""
+Naive Bayes disease prediction backend.
+
+The model is trained from a symptom CSV (one 0/1 column per symptom plus a
+'prognosis' column) by the train_disease_model management command and saved
+as an uncompressed .npz artifact. Both Bernoulli and multinomial models reduce
+to a linear score per disease, bias + weights @ x, so the artifact only holds
+those arrays. At runtime the arrays are memory-mapped straight out of the
+.npz on first use, so importing the app stays cheap.
+"""
+import csv
+import struct
+import threading
+import zipfile
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+MODEL_KINDS = ('bernoulli', 'multinomial')
+
+
+def load_training_data(csv_path, target_column='prognosis'):
+    """
+    Read a symptom CSV into (symptoms, diseases, X, y).
+    Duplicate symptom columns are merged; X is an N x S uint8 multi-hot matrix
+    and y holds each row's index into diseases.
+    """
+    with open(csv_path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        target = header.index(target_column)
+
+        symptoms = []
+        column_to_feature = {}
+        for column, name in enumerate(header):
+            if column == target:
+                continue
+            name = name.strip()
+            if name not in symptoms:
+                symptoms.append(name)
+            column_to_feature[column] = symptoms.index(name)
+
+        diseases = []
+        disease_index = {}
+        rows = []
+        labels = []
+        for record in reader:
+            if not record:
+                continue
+            row = np.zeros(len(symptoms), dtype=np.uint8)
+            for column, feature in column_to_feature.items():
+                if record[column].strip() not in ('', '0'):
+                    row[feature] = 1
+            disease = record[target].strip()
+            if disease not in disease_index:
+                disease_index[disease] = len(diseases)
+                diseases.append(disease)
+            rows.append(row)
+            labels.append(disease_index[disease])
+
+    return symptoms, diseases, np.array(rows, dtype=np.uint8), np.array(labels, dtype=np.int64)
+
+
+def train_naive_bayes(X, y, n_classes, kind='multinomial', alpha=1.0):
+    """
+    Fit a Naive Bayes model with Laplace smoothing.
+    Returns (weights, bias) such that the log joint probability of class c for a
+    multi-hot vector x is bias[c] + weights[c] @ x (up to a constant).
+    """
+    if kind not in MODEL_KINDS:
+        raise ValueError(f"Unknown model kind '{kind}', expected one of {MODEL_KINDS}")
+
+    X = X.astype(np.float64)
+    one_hot = np.zeros((len(y), n_classes))
+    one_hot[np.arange(len(y)), y] = 1
+    class_counts = one_hot.sum(axis=0)
+    feature_counts = one_hot.T @ X
+    log_prior = np.log(class_counts / class_counts.sum())
+
+    if kind == 'bernoulli':
+        p = (feature_counts + alpha) / (class_counts[:, None] + 2 * alpha)
+        weights = np.log(p) - np.log1p(-p)
+        bias = log_prior + np.log1p(-p).sum(axis=1)
+    else:
+        theta = (feature_counts + alpha) / (feature_counts.sum(axis=1, keepdims=True) + alpha * X.shape[1])
+        weights = np.log(theta)
+        bias = log_prior
+
+    return weights.astype(np.float32), bias.astype(np.float32)
+
+
+def save_model(path, symptoms, diseases, weights, bias, class_symptoms, kind):
+    """Write the model as an uncompressed .npz so it can be memory-mapped."""
+    np.savez(
+        path,
+        symptoms=np.array(symptoms),
+        diseases=np.array(diseases),
+        weights=weights,
+        bias=bias,
+        class_symptoms=np.packbits(class_symptoms.astype(bool), axis=1),
+        n_symptoms=np.array(len(symptoms)),
+        kind=np.array(kind),
+    )
+
+
+def _memmap_npz(path):
+    """
+    Memory-map every array stored uncompressed in an .npz archive. Scalars and
+    compressed members can't be mapped and are read normally instead.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as raw, np.load(path) as npz:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            with archive.open(info) as member:
+                version = np.lib.format.read_magic(member)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(member)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(member)
+                header_length = member.tell()
+
+            if info.compress_type != zipfile.ZIP_STORED or dtype.hasobject or not shape or 0 in shape:
+                arrays[name] = npz[name]
+                continue
+
+            # Data starts after the zip local file header and the .npy header
+            raw.seek(info.header_offset)
+            local_header = raw.read(30)
+            name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+            offset = info.header_offset + 30 + name_length + extra_length + header_length
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                                     order='F' if fortran_order else 'C')
+    return arrays
+
+
+class NaiveBayesModel:
+    """A trained model loaded from an artifact, scoring symptom lists."""
+
+    def __init__(self, path):
+        arrays = _memmap_npz(path)
+        self.path = path
+        self.kind = str(arrays['kind'])
+        self.symptoms = [str(s) for s in arrays['symptoms']]
+        self.diseases = [str(d) for d in arrays['diseases']]
+        self.weights = arrays['weights']
+        self.bias = arrays['bias']
+        self.class_symptoms = np.unpackbits(arrays['class_symptoms'], axis=1,
+                                            count=int(arrays['n_symptoms'])).astype(bool)
+        self.symptom_index = {symptom: i for i, symptom in enumerate(self.symptoms)}
+
+    def predict_proba(self, matrix):
+        """Posterior probabilities for an N x S multi-hot matrix over self.symptoms."""
+        scores = np.asarray(matrix, dtype=np.float32) @ self.weights.T + self.bias
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict(self, symptoms_list, top_k=5):
+        """
+        Same output shape as utils.predict_disease. Only diseases whose training
+        rows share at least one of the given symptoms are returned.
+        """
+        if not symptoms_list:
+            return []
+
+        x = np.zeros((1, len(self.symptoms)), dtype=np.float32)
+        for symptom in symptoms_list:
+            index = self.symptom_index.get(symptom)
+            if index is not None:
+                x[0, index] = 1
+        if not x.any():
+            return []
+
+        probabilities = self.predict_proba(x)[0]
+        selected = x[0].astype(bool)
+        predictions = []
+        for position in np.argsort(-probabilities, kind='stable'):
+            matched = self.class_symptoms[position] & selected
+            if not matched.any():
+                continue
+            predictions.append({
+                'disease': self.diseases[position],
+                # Capped like the pattern engine; this is a preliminary screen
+                'probability': min(95, round(float(probabilities[position]) * 100)),
+                'matched_symptoms': [self.symptoms[i] for i in np.flatnonzero(matched)],
+                'total_pattern_symptoms': int(self.class_symptoms[position].sum())
+            })
+            if len(predictions) == top_k:
+                break
+        return predictions
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_naive_bayes_model():
+    """Load settings.DISEASE_MODEL_PATH on first use and keep it for the process."""
+    global _model
+    path = str(settings.DISEASE_MODEL_PATH)
+    if _model is None or _model.path != path:
+        with _model_lock:
+            if _model is None or _model.path != path:
+                try:
+                    _model = NaiveBayesModel(path)
+                except FileNotFoundError:
+                    raise ImproperlyConfigured(
+                        f"Disease model artifact '{path}' not found; run 'manage.py train_disease_model'"
+                    )
+    return _model
@@ -4,9 +4,10 @@ from django.contrib.auth import authenticate
 from datetime import date
 import re
 from .models import (
-    CustomUser, DoctorProfile, PatientProfile, MedicalForm, 
+    CustomUser, DoctorProfile, PatientProfile, MedicalForm, MedicalTag,
     MedicalRecord, Appointment, Checkup, Prescription, Medication
 )
+from .booking import SLOT_TAKEN_MESSAGE
 
 
 class LoginForm(forms.Form):
@@ -228,16 +229,7 @@ class MedicalFormForm(forms.ModelForm):
         'class': 'form-check-input'
     }))
     chronic_disease_choices = forms.MultipleChoiceField(
-        choices=[
-            ('Diabetes', 'Diabetes'),
-            ('Hypertension', 'Hypertension'),
-            ('Asthma', 'Asthma'),
-            ('Heart Disease', 'Heart Disease'),
-            ('Cancer', 'Cancer'),
-            ('Kidney Disease', 'Kidney Disease'),
-            ('Liver Disease', 'Liver Disease'),
-            ('Other', 'Other'),
-        ],
+        choices=[(name, name) for name in MedicalTag.VOCABULARY[MedicalTag.CHRONIC_DISEASE]],
         widget=forms.CheckboxSelectMultiple(attrs={
             'class': 'form-check-input'
         }),
@@ -256,15 +248,7 @@ class MedicalFormForm(forms.ModelForm):
     
     # Vaccines
     vaccine_choices = forms.MultipleChoiceField(
-        choices=[
-            ('BCG', 'BCG'),
-            ('Hepatitis B', 'Hepatitis B'),
-            ('Polio', 'Polio'),
-            ('MMR', 'MMR'),
-            ('Tetanus', 'Tetanus'),
-            ('Influenza', 'Influenza'),
-            ('COVID-19', 'COVID-19'),
-        ],
+        choices=[(name, name) for name in MedicalTag.VOCABULARY[MedicalTag.VACCINE]],
         widget=forms.CheckboxSelectMultiple(attrs={
             'class': 'form-check-input'
         }),
@@ -276,22 +260,36 @@ class MedicalFormForm(forms.ModelForm):
         'class': 'form-check-input'
     }))
     family_history_choices = forms.MultipleChoiceField(
-        choices=[
-            ('Diabetes', 'Diabetes'),
-            ('Hypertension', 'Hypertension'),
-            ('Cancer', 'Cancer'),
-            ('Heart Disease', 'Heart Disease'),
-            ('Other', 'Other'),
-        ],
+        choices=[(name, name) for name in MedicalTag.VOCABULARY[MedicalTag.FAMILY_HISTORY]],
         widget=forms.CheckboxSelectMultiple(attrs={
             'class': 'form-check-input'
         }),
         required=False
     )
     
+    # Checklist field -> MedicalTag category it is stored as
+    TAG_FIELDS = {
+        'chronic_disease_choices': MedicalTag.CHRONIC_DISEASE,
+        'vaccine_choices': MedicalTag.VACCINE,
+        'family_history_choices': MedicalTag.FAMILY_HISTORY,
+    }
+    
     class Meta:
         model = MedicalForm
-        fields = ['has_chronic_diseases', 'has_allergies', 'has_family_history']
+        fields = ['has_chronic_diseases', 'has_allergies', 'allergies', 'has_family_history']
+    
+    def save(self, commit=True):
+        medical_form = super().save(commit=commit)
+        if commit:
+            self.save_tags()
+        else:
+            self.save_m2m = self.save_tags
+        return medical_form
+    
+    def save_tags(self):
+        self.instance.set_tags({
+            category: self.cleaned_data.get(field) or [] for field, category in self.TAG_FIELDS.items()
+        })
 
 
 class MedicalRecordForm(forms.ModelForm):
@@ -315,9 +313,8 @@ class AppointmentBookForm(forms.ModelForm):
         model = Appointment
         fields = ['doctor', 'date', 'time', 'reason']
         widgets = {
-            'doctor': forms.Select(attrs={
-                'class': 'form-control'
-            }),
+            # Chosen through the doctor search box; only the id is submitted
+            'doctor': forms.HiddenInput(),
             'date': forms.DateInput(attrs={
                 'class': 'form-control',
                 'type': 'date'
@@ -335,13 +332,40 @@ class AppointmentBookForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['doctor'].queryset = DoctorProfile.objects.all()
+        # Never rendered as options: validating a submitted id is a single lookup
+        self.fields['doctor'].queryset = DoctorProfile.objects.select_related('user')
+        self.fields['doctor'].error_messages['invalid_choice'] = "Please select a doctor from the search results."
+    
+    def selected_doctor(self):
+        """The doctor whose id was submitted, to redisplay it when the form has errors."""
+        if self.is_bound and 'doctor' in getattr(self, 'cleaned_data', {}):
+            return self.cleaned_data['doctor']
+        doctor_id = self['doctor'].value()
+        if not doctor_id:
+            return None
+        try:
+            return self.fields['doctor'].queryset.filter(pk=doctor_id).first()
+        except (ValueError, TypeError):
+            return None
     
     def clean_date(self):
         appointment_date = self.cleaned_data.get('date')
         if appointment_date and appointment_date <= date.today():
             raise ValidationError("Appointment date must be in the future")
         return appointment_date
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        doctor = cleaned_data.get('doctor')
+        appointment_date = cleaned_data.get('date')
+        appointment_time = cleaned_data.get('time')
+        # Early, friendly check; the database constraint settles concurrent bookings
+        if doctor and appointment_date and appointment_time and Appointment.objects.filter(
+            doctor=doctor, date=appointment_date, time=appointment_time,
+            status__in=Appointment.ACTIVE_STATUSES
+        ).exists():
+            raise ValidationError(SLOT_TAKEN_MESSAGE)
+        return cleaned_data
 
 
 class CheckupForm(forms.ModelForm):
@@ -495,3 +519,15 @@ class AppointmentUpdateForm(forms.ModelForm):
                 'placeholder': 'Add notes to the appointment'
             })
         }
+
+    def clean_status(self):
+        status = self.cleaned_data.get('status')
+        appointment = self.instance
+        # Reactivating a cancelled appointment needs its slot to be free; the
+        # database constraint settles a concurrent booking (booking.save_appointment)
+        if status in Appointment.ACTIVE_STATUSES and Appointment.objects.filter(
+            doctor_id=appointment.doctor_id, date=appointment.date, time=appointment.time,
+            status__in=Appointment.ACTIVE_STATUSES
+        ).exclude(pk=appointment.pk).exists():
+            raise ValidationError(SLOT_TAKEN_MESSAGE)
+        return status
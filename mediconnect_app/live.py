@@ -0,0 +1,225 @@
+"""
+Live message delivery for the Server-Sent Events stream (views.message_stream).
+
+Every open stream subscribes an asyncio.Queue for its user with the process
+wide `broadcaster`. Events reach the queues in one of two ways, picked by
+settings.LIVE_MESSAGES_BACKEND:
+
+- 'local': the Message post_save signal publishes on commit, straight to the
+  subscribers in this process. Right for a single ASGI process.
+- 'database': one task per process follows Message rows by id every
+  LIVE_MESSAGES_POLL_SECONDS and fans them out, so messages sent through any
+  process reach streams in all of them. That is one query per process per
+  interval, however many clients are connected.
+
+Read receipts (unread counts dropping) are always published locally.
+
+Streams only work under ASGI: WSGI servers consume an async streaming
+response whole before sending anything, holding a worker thread for the
+stream's full length. live_messages_enabled() is false there (and when the
+backend setting is None), so pages don't open the stream and the view
+answers 204, which tells EventSource not to reconnect.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Sum
+
+from .models import ConversationParticipant, Message
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per connection before new ones are dropped; clients resync on reconnect
+SUBSCRIBER_QUEUE_SIZE = 100
+# Comment lines sent on idle streams so proxies don't time the connection out
+KEEPALIVE_SECONDS = 15
+# Browser reconnect delay after a stream ends
+RETRY_MILLISECONDS = 3000
+
+
+class Subscription:
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+class Broadcaster:
+    """Per-process registry of stream subscriptions, safe to publish to from any thread."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self._cursor_task = None
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        if settings.LIVE_MESSAGES_BACKEND == 'database':
+            self._ensure_cursor()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscriptions
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            # Signals run on request threads; queues belong to the event loop
+            subscription.loop.call_soon_threadsafe(subscription.push, event)
+
+    def _ensure_cursor(self):
+        if self._cursor_task is None or self._cursor_task.done():
+            self._cursor_task = asyncio.get_running_loop().create_task(self._follow_messages())
+
+    async def _follow_messages(self):
+        last_id = await sync_to_async(_latest_message_id)()
+        while self._subscriptions:
+            await asyncio.sleep(settings.LIVE_MESSAGES_POLL_SECONDS)
+            try:
+                events, last_id = await sync_to_async(_message_events_after)(last_id, set(self._subscriptions))
+            except Exception:
+                logger.exception('Live message cursor failed; retrying')
+                continue
+            for user_id, event in events:
+                self.publish(user_id, event)
+
+
+broadcaster = Broadcaster()
+
+
+def total_unread(user_id):
+    return ConversationParticipant.objects.filter(user_id=user_id).aggregate(
+        total=Sum('unread_count', default=0)
+    )['total']
+
+
+def _display_name(user):
+    if user.role == 'doctor':
+        return f"Dr. {user.last_name}"
+    return f"{user.first_name} {user.last_name}".strip() or user.email
+
+
+def message_event(message, conversation_unread, unread_total):
+    return {
+        'event': 'message',
+        'data': {
+            'id': message.id,
+            'conversation_id': message.conversation_id,
+            'sender_id': message.sender_id,
+            'sender_name': _display_name(message.sender),
+            'subject': message.subject,
+            'body': message.body,
+            'created_at': message.created_at.isoformat(),
+            'conversation_unread': conversation_unread,
+            'unread_total': unread_total,
+        },
+    }
+
+
+def _latest_message_id():
+    return Message.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _message_events_after(last_id, user_ids, limit=500):
+    """(recipient_id, event) for messages after last_id addressed to user_ids, and the new cursor."""
+    new_messages = list(
+        Message.objects.filter(id__gt=last_id).select_related('sender').order_by('id')[:limit]
+    )
+    if not new_messages:
+        return [], last_id
+
+    recipients = {message.recipient_id for message in new_messages} & user_ids
+    unread = {
+        (row['conversation_id'], row['user_id']): row['unread_count']
+        for row in ConversationParticipant.objects.filter(user_id__in=recipients).values(
+            'conversation_id', 'user_id', 'unread_count'
+        )
+    }
+    totals = {user_id: 0 for user_id in recipients}
+    for (_conversation_id, user_id), count in unread.items():
+        totals[user_id] += count
+
+    events = [
+        (message.recipient_id, message_event(
+            message, unread.get((message.conversation_id, message.recipient_id), 0), totals[message.recipient_id]
+        ))
+        for message in new_messages if message.recipient_id in recipients
+    ]
+    return events, new_messages[-1].id
+
+
+def live_messages_enabled(request):
+    """Whether `request` can hold a message stream open: live delivery is on and it came in over ASGI."""
+    return bool(settings.LIVE_MESSAGES_BACKEND) and isinstance(request, ASGIRequest)
+
+
+def publish_message(message):
+    """Called on commit of a new message (local backend only)."""
+    if settings.LIVE_MESSAGES_BACKEND != 'local' or not broadcaster.has_subscribers(message.recipient_id):
+        return
+    conversation_unread = ConversationParticipant.objects.filter(
+        conversation_id=message.conversation_id, user_id=message.recipient_id
+    ).values_list('unread_count', flat=True).first() or 0
+    broadcaster.publish(message.recipient_id, message_event(
+        message, conversation_unread, total_unread(message.recipient_id)
+    ))
+
+
+def publish_read(user_id, conversation_id):
+    """Tell the user's other tabs that a conversation was read."""
+    if broadcaster.has_subscribers(user_id):
+        broadcaster.publish(user_id, {
+            'event': 'read',
+            'data': {'conversation_id': conversation_id, 'unread_total': total_unread(user_id)},
+        })
+
+
+def format_event(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+async def stream_events(user_id):
+    """
+    Server-Sent Events for one connection: the current unread total, then each
+    event published for the user, until LIVE_MESSAGES_MAX_STREAM_SECONDS.
+    """
+    # Subscribe before reading the total so nothing sent in between is missed
+    subscription = broadcaster.subscribe(user_id)
+    try:
+        unread_total = await sync_to_async(total_unread)(user_id)
+        yield f"retry: {RETRY_MILLISECONDS}\n" + format_event({'event': 'unread', 'data': {'unread_total': unread_total}})
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.LIVE_MESSAGES_MAX_STREAM_SECONDS
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), min(KEEPALIVE_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,65 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from mediconnect_app.models import MedicalRecord
+from mediconnect_app.uploads import file_sha256, save_blob
+
+
+class Command(BaseCommand):
+    help = (
+        'Hash medical records stored before content addressing, record their sha256 and size, and move '
+        'their files into the shared sha256 blobs (identical files end up as one blob)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Records read per batch')
+        parser.add_argument('--keep-originals', action='store_true', help='Leave the old files in place')
+        parser.add_argument('--dry-run', action='store_true', help='Hash and report without writing')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = MedicalRecord.objects.filter(sha256='').only('pk', 'patient_id', 'file').order_by('pk')
+
+        start = time.perf_counter()
+        scanned = moved = missing = 0
+        last_pk = 0
+
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            for record in chunk:
+                scanned += 1
+                old_name = record.file.name
+                if not old_name or not default_storage.exists(old_name):
+                    missing += 1
+                    self.stderr.write(f"  record {record.pk}: file {old_name!r} is missing, skipped")
+                    continue
+                if options['dry_run']:
+                    moved += 1
+                    continue
+
+                with default_storage.open(old_name, 'rb') as stored:
+                    sha256 = file_sha256(stored)
+                    size = stored.size
+                    name = save_blob(sha256, stored)
+                # save() rather than update(), so cached patient charts pick up the new file URL
+                record.file.name, record.sha256, record.size = name, sha256, size
+                record.save(update_fields=['file', 'sha256', 'size'])
+                moved += 1
+
+                # The old name may be shared by records copied before this ran
+                if not options['keep_originals'] and not MedicalRecord.objects.filter(file=old_name).exists():
+                    default_storage.delete(old_name)
+
+            self.stdout.write(f"  up to pk {last_pk}: {scanned} scanned, {moved} hashed, {missing} missing")
+
+        elapsed = time.perf_counter() - start
+        verb = 'would hash' if options['dry_run'] else 'hashed'
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} records, {verb} {moved}, {missing} missing files, in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mediconnect_app.models import Checkup
+from mediconnect_app.tasks import predict_diseases_for_texts
+
+
+class Command(BaseCommand):
+    help = 'Fill Checkup.predicted_disease for existing checkups, in primary-key chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Checkups read, scored and written per batch')
+        parser.add_argument('--overwrite', action='store_true', help='Recompute checkups that already have a value')
+        parser.add_argument('--dry-run', action='store_true', help='Score without writing')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = Checkup.objects.only('pk', 'symptoms', 'predicted_disease').order_by('pk')
+        if not options['overwrite']:
+            queryset = queryset.filter(predicted_disease='')
+
+        start = time.perf_counter()
+        scanned = updated = 0
+        last_pk = 0
+
+        while True:
+            # Keyset paging on pk keeps every chunk query equally cheap and memory flat
+            chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size].iterator(chunk_size=chunk_size))
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            scanned += len(chunk)
+
+            predictions = predict_diseases_for_texts([checkup.symptoms for checkup in chunk])
+            changed = []
+            for checkup, predicted in zip(chunk, predictions):
+                if predicted and predicted != checkup.predicted_disease:
+                    checkup.predicted_disease = predicted
+                    changed.append(checkup)
+
+            if changed and not options['dry_run']:
+                Checkup.objects.bulk_update(changed, ['predicted_disease'], batch_size=chunk_size)
+            updated += len(changed)
+
+            self.stdout.write(f"  up to pk {last_pk}: {scanned} scanned, {updated} updated")
+
+        elapsed = time.perf_counter() - start
+        verb = 'would update' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} checkups, {verb} {updated} in {elapsed:.2f}s"
+        ))
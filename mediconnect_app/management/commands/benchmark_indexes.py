@@ -0,0 +1,265 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+
+from mediconnect_app.models import (
+    Appointment, Checkup, CustomUser, DoctorProfile, Medication, Message, PatientProfile, Prescription
+)
+
+# The composite indexes from migration 0010, dropped for the "before" run
+BENCHMARKED_INDEXES = [
+    (Appointment, 'appointment_doctor_day_idx'),
+    (Appointment, 'appointment_patient_day_idx'),
+    (Checkup, 'checkup_patient_doctor_idx'),
+    (Message, 'message_recipient_idx'),
+    (Message, 'message_sender_idx'),
+    (Medication, 'medication_patient_status_idx'),
+    (Prescription, 'prescription_doctor_idx'),
+]
+
+# Share of --rows seeded into each table
+ROW_SHARES = [
+    (Appointment, 0.4),
+    (Message, 0.3),
+    (Checkup, 0.1),
+    (Prescription, 0.1),
+    (Medication, 0.1),
+]
+
+# Slot times per doctor and day; appointments fill (doctor, day, slot) in order so none collide
+SLOT_TIMES = [dt_time(8 + i // 2, 30 * (i % 2)) for i in range(18)]
+SPAN_DAYS = 730
+
+STATUSES = [status for status, _label in Appointment.STATUS_CHOICES]
+MEDICATION_STATUSES = [status for status, _label in Medication.STATUS_CHOICES]
+
+
+def access_paths(ctx):
+    """(label, queryset) for the filters the views actually run."""
+    today = ctx['today']
+    return [
+        ("doctor's day schedule", Appointment.objects.filter(
+            doctor_id=ctx['doctor_id'], date=today, status__in=Appointment.ACTIVE_STATUSES
+        ).order_by('time')),
+        ("doctor's status tabs", Appointment.objects.filter(
+            doctor_id=ctx['doctor_id']
+        ).values_list('status').annotate(n=Count('id')).order_by()),
+        ("patient's upcoming", Appointment.objects.filter(
+            patient_id=ctx['patient_id'], date__gte=today, status__in=Appointment.ACTIVE_STATUSES
+        ).order_by('date', 'time')[:3]),
+        ("patient's checkups with doctor", Checkup.objects.filter(
+            patient_id=ctx['checkup_patient_id'], doctor_id=ctx['checkup_doctor_id']
+        ).order_by('-created_at')),
+        ('received messages', Message.objects.filter(recipient_id=ctx['user_id']).order_by('-created_at')[:20]),
+        ('sent messages', Message.objects.filter(sender_id=ctx['user_id']).order_by('-created_at')[:20]),
+        ('active medications', Medication.objects.filter(
+            patient_id=ctx['patient_id'], status='active'
+        ).order_by('-start_date')),
+        ("doctor's prescriptions today", Prescription.objects.filter(
+            doctor_id=ctx['doctor_id'], created_at__gte=ctx['start_of_today']
+        ).values('id')),
+        ("doctor's recent prescriptions", Prescription.objects.filter(
+            doctor_id=ctx['doctor_id']
+        ).order_by('-created_at')[:20]),
+    ]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at values we set instead of stamping now()."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database with --rows rows across appointments, messages, checkups, '
+        'prescriptions and medications, then report EXPLAIN plans and timings of the views\' '
+        'access paths without and with the composite indexes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Total rows to seed')
+        parser.add_argument('--repeat', type=int, default=30, help='Timed runs per query; the median is reported')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Load without the indexes: faster, and the first measurement needs them gone anyway
+            self._drop_indexes()
+            ctx = self._seed(options['rows'])
+            before = self._measure(ctx, options['repeat'])
+
+            start = time.perf_counter()
+            self._create_indexes()
+            self.stdout.write(f"Built {len(BENCHMARKED_INDEXES)} indexes in {time.perf_counter() - start:.1f}s\n")
+            after = self._measure(ctx, options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self._report(before, after)
+
+    # Indexes
+
+    def _indexes(self):
+        for model, name in BENCHMARKED_INDEXES:
+            yield model, next(index for index in model._meta.indexes if index.name == name)
+
+    def _drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, index in self._indexes():
+                editor.remove_index(model, index)
+
+    def _create_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, index in self._indexes():
+                editor.add_index(model, index)
+
+    # Measuring
+
+    def _analyze(self):
+        # Refresh planner statistics so both runs plan from the same information
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def _measure(self, ctx, repeat):
+        self._analyze()
+        results = {}
+        for label, queryset in access_paths(ctx):
+            plan = queryset.explain()
+            # Time the SQL alone; building model instances would drown the difference on small results
+            sql, params = queryset.query.sql_with_params()
+            timings = []
+            with connection.cursor() as cursor:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    cursor.execute(sql, params)
+                    rows = len(cursor.fetchall())
+                    timings.append((time.perf_counter() - start) * 1000)
+            results[label] = {'plan': plan, 'ms': statistics.median(timings), 'rows': rows}
+        return results
+
+    def _report(self, before, after):
+        self.stdout.write(f"{'access path':<32} {'rows':>6} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+        for label, old in before.items():
+            new = after[label]
+            speedup = old['ms'] / new['ms'] if new['ms'] else float('inf')
+            self.stdout.write(f"{label:<32} {new['rows']:>6} {old['ms']:>10.3f} {new['ms']:>10.3f} {speedup:>7.1f}x")
+
+        self.stdout.write('\nQuery plans')
+        for label, old in before.items():
+            self.stdout.write(f"\n{label}\n  before:")
+            for line in old['plan'].splitlines():
+                self.stdout.write(f"    {line}")
+            self.stdout.write('  after:')
+            for line in after[label]['plan'].splitlines():
+                self.stdout.write(f"    {line}")
+
+    # Seeding
+
+    def _bulk(self, model, count, factory):
+        start = time.perf_counter()
+        for offset in range(0, count, self.batch_size):
+            model.objects.bulk_create(
+                [factory(i) for i in range(offset, min(count, offset + self.batch_size))],
+                batch_size=self.batch_size
+            )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"  {model.__name__}: {count} rows in {elapsed:.1f}s")
+
+    def _seed(self, rows):
+        rng = self.rng
+        now = timezone.now()
+        today = timezone.localdate()
+        first_day = today - timedelta(days=SPAN_DAYS // 2)
+        counts = {model: int(rows * share) for model, share in ROW_SHARES}
+        doctor_count = max(10, rows // 5000)
+        patient_count = max(100, rows // 50)
+        self.stdout.write(f"Seeding {sum(counts.values())} rows, {doctor_count} doctors, {patient_count} patients")
+
+        # Users bypass create_user: no password hashing for 20k accounts
+        self._bulk(CustomUser, doctor_count + patient_count, lambda i: CustomUser(
+            email=f'user{i}@bench.invalid', password='!', first_name=f'First{i}', last_name=f'Last{i}',
+            role='doctor' if i < doctor_count else 'patient'
+        ))
+        user_ids = list(CustomUser.objects.order_by('id').values_list('id', flat=True))
+        self._bulk(DoctorProfile, doctor_count, lambda i: DoctorProfile(
+            user_id=user_ids[i], phone='10000000', specialization='General Practice', years_of_experience=10,
+            license_number=f'BENCH-{i}', clinic_name='Bench', clinic_address='-'
+        ))
+        self._bulk(PatientProfile, patient_count, lambda i: PatientProfile(
+            user_id=user_ids[doctor_count + i], phone='10000000', date_of_birth=datetime(1950 + i % 50, 1, 1).date(),
+            gender='MF'[i % 2], city='Paris', country='France'
+        ))
+        doctor_ids = list(DoctorProfile.objects.order_by('id').values_list('id', flat=True))
+        patient_ids = list(PatientProfile.objects.order_by('id').values_list('id', flat=True))
+
+        def moment(i):
+            return now - timedelta(seconds=rng.randrange(SPAN_DAYS * 86400))
+
+        # Walks (doctor, day, slot) so every active appointment has its own slot
+        self._bulk(Appointment, counts[Appointment], lambda i: Appointment(
+            doctor_id=doctor_ids[i % doctor_count],
+            date=first_day + timedelta(days=(i // doctor_count) % SPAN_DAYS),
+            time=SLOT_TIMES[(i // (doctor_count * SPAN_DAYS)) % len(SLOT_TIMES)],
+            patient_id=rng.choice(patient_ids), reason='Benchmark', status=rng.choice(STATUSES)
+        ))
+
+        with explicit_timestamps(Message, Checkup, Prescription):
+            self._bulk(Message, counts[Message], lambda i: Message(
+                sender_id=rng.choice(user_ids), recipient_id=rng.choice(user_ids), subject='Benchmark',
+                body='Hello', created_at=moment(i)
+            ))
+            checkup_pairs = [(rng.choice(patient_ids), rng.choice(doctor_ids)) for _ in range(counts[Checkup])]
+            self._bulk(Checkup, counts[Checkup], lambda i: Checkup(
+                patient_id=checkup_pairs[i][0], doctor_id=checkup_pairs[i][1], heart_rate=72,
+                blood_pressure_systolic=120, blood_pressure_diastolic=80, temperature=98.6, oxygen_saturation=98,
+                weight=70, height=175, symptoms='Benchmark', diagnosis='Benchmark', created_at=moment(i)
+            ))
+            checkup_ids = list(Checkup.objects.order_by('id').values_list('id', flat=True))
+
+            def prescription(i):
+                c = rng.randrange(len(checkup_ids))
+                return Prescription(
+                    checkup_id=checkup_ids[c], patient_id=checkup_pairs[c][0], doctor_id=checkup_pairs[c][1],
+                    medication_name='Paracetamol', dosage='500mg', frequency='Twice daily', duration='5 days',
+                    created_at=moment(i)
+                )
+            self._bulk(Prescription, counts[Prescription], prescription)
+
+        self._bulk(Medication, counts[Medication], lambda i: Medication(
+            patient_id=rng.choice(patient_ids), medication_name='Paracetamol', dosage='500mg', frequency='Twice daily',
+            status=rng.choice(MEDICATION_STATUSES), start_date=first_day + timedelta(days=rng.randrange(SPAN_DAYS))
+        ))
+
+        return {
+            'today': today,
+            'start_of_today': timezone.make_aware(datetime.combine(today, dt_time.min)),
+            'doctor_id': doctor_ids[0],
+            'patient_id': patient_ids[0],
+            'user_id': user_ids[doctor_count],
+            'checkup_patient_id': checkup_pairs[0][0],
+            'checkup_doctor_id': checkup_pairs[0][1],
+        }
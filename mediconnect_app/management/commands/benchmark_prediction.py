@@ -0,0 +1,115 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from mediconnect_app.utils import (
+    DISEASE_PATTERNS, predict_disease_batch, predict_disease_uncached, score_symptom_matrix,
+    symptoms_to_matrix
+)
+
+
+def legacy_predict_disease(symptoms_list):
+    """Original linear-scan implementation, kept as the benchmark reference."""
+    if not symptoms_list:
+        return []
+
+    predictions = []
+
+    for disease, pattern in DISEASE_PATTERNS.items():
+        matched = [s for s in pattern if s in symptoms_list]
+        match_count = len(matched)
+        pattern_length = len(pattern)
+
+        if match_count > 0:
+            base_prob = (match_count / pattern_length) * 100
+            adjustment = min(1, pattern_length / (len(symptoms_list) + 1))
+            final_prob = min(95, base_prob * (1 + adjustment * 0.2))
+
+            predictions.append({
+                'disease': disease,
+                'probability': round(final_prob),
+                'matched_symptoms': matched,
+                'total_pattern_symptoms': pattern_length
+            })
+
+    predictions.sort(key=lambda x: x['probability'], reverse=True)
+    return predictions[:5]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the indexed prediction engine against the original linear-scan implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,3,8,20,50,all',
+                            help='Comma separated symptom set sizes ("all" = every known symptom)')
+        parser.add_argument('--samples', type=int, default=200, help='Random symptom sets per size')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing passes per size')
+        parser.add_argument('--batch-rows', type=int, default=100000,
+                            help='Rows for the predict_disease_batch comparison (0 to skip)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        all_symptoms = sorted({s for pattern in DISEASE_PATTERNS.values() for s in pattern})
+
+        self.stdout.write(f"{len(DISEASE_PATTERNS)} diseases, {len(all_symptoms)} distinct symptoms")
+        self.stdout.write(f"{'size':>6} {'legacy (us)':>12} {'indexed (us)':>13} {'speedup':>8}  results")
+
+        for size in options['sizes'].split(','):
+            size = size.strip()
+            k = len(all_symptoms) if size == 'all' else min(int(size), len(all_symptoms))
+            samples = [rng.sample(all_symptoms, k) for _ in range(options['samples'])]
+
+            mismatches = sum(
+                1 for symptoms in samples
+                if legacy_predict_disease(symptoms) != predict_disease_uncached(symptoms)
+            )
+
+            legacy = self._time(legacy_predict_disease, samples, options['repeat'])
+            indexed = self._time(predict_disease_uncached, samples, options['repeat'])
+
+            status = 'equal' if not mismatches else f'{mismatches} MISMATCHES'
+            self.stdout.write(
+                f"{k:>6} {legacy:>12.2f} {indexed:>13.2f} {legacy / indexed:>7.1f}x  {status}"
+            )
+            if mismatches:
+                self.stderr.write(self.style.ERROR(f"Results differ for size {k}"))
+
+        if options['batch_rows']:
+            self._benchmark_batch(rng, all_symptoms, options['batch_rows'])
+
+    def _benchmark_batch(self, rng, all_symptoms, rows):
+        symptom_sets = [rng.sample(all_symptoms, rng.randint(1, 12)) for _ in range(rows)]
+
+        start = time.perf_counter()
+        looped = [predict_disease_uncached(symptoms) for symptoms in symptom_sets]
+        looped_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = predict_disease_batch(symptom_sets)
+        batched_time = time.perf_counter() - start
+
+        # Matrix scoring alone, without building the result dicts
+        start = time.perf_counter()
+        score_symptom_matrix(*symptoms_to_matrix(symptom_sets))
+        matrix_time = time.perf_counter() - start
+
+        mismatches = sum(1 for a, b in zip(looped, batched) if a != b)
+        status = 'equal' if not mismatches else f'{mismatches} MISMATCHES'
+        self.stdout.write(
+            f"batch of {rows}: uncached loop {looped_time:.2f}s, predict_disease_batch {batched_time:.2f}s "
+            f"({looped_time / batched_time:.1f}x), matrix scoring only {matrix_time:.2f}s  {status}"
+        )
+        if mismatches:
+            self.stderr.write(self.style.ERROR("Batch results differ from predict_disease"))
+
+    def _time(self, func, samples, repeat):
+        # Best of N passes, reported as microseconds per call
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for symptoms in samples:
+                func(symptoms)
+            best = min(best, time.perf_counter() - start)
+        return best / len(samples) * 1e6
@@ -0,0 +1,103 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from mediconnect_app.utils import DISEASE_PATTERNS, extract_symptoms
+
+FILLER_WORDS = [
+    'i', 'have', 'been', 'feeling', 'really', 'bad', 'since', 'yesterday', 'and', 'also',
+    'my', 'doctor', 'said', 'the', 'pain', 'is', 'worse', 'at', 'night', 'with', 'some',
+    # Words that contain symptom names but are not mentions of them
+    'chillsome', 'coughing', 'headaches', 'itchingly', 'unfatigued', 'nauseated',
+]
+
+
+def legacy_extract_symptoms(message):
+    """Original per-symptom substring scan from handle_chatbot_query."""
+    all_symptoms = set()
+    for pattern in DISEASE_PATTERNS.values():
+        all_symptoms.update(pattern)
+
+    detected_symptoms = []
+    for s in all_symptoms:
+        if s.replace('_', ' ') in message or s in message:
+            detected_symptoms.append(s)
+    return detected_symptoms
+
+
+def reference_extract_symptoms(message):
+    """Slow but obviously correct whole-word matcher used to check the automaton."""
+    text = ' '.join(re.findall(r'[a-z0-9]+', message.lower()))
+    found = set()
+    for pattern in DISEASE_PATTERNS.values():
+        for symptom in pattern:
+            phrase = ' '.join(re.findall(r'[a-z0-9]+', symptom))
+            if re.search(r'(?<![a-z0-9])' + re.escape(phrase) + r'(?![a-z0-9])', text):
+                found.add(symptom)
+    return found
+
+
+class Command(BaseCommand):
+    help = 'Benchmark extract_symptoms against the original substring scan on long messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', default='20,200,2000,20000',
+                            help='Comma separated message lengths in words')
+        parser.add_argument('--messages', type=int, default=20, help='Messages per length')
+        parser.add_argument('--density', type=float, default=0.001,
+                            help='Probability that a word is a symptom mention')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        symptoms = sorted({s for pattern in DISEASE_PATTERNS.values() for s in pattern})
+
+        self.stdout.write(f"{'words':>7} {'legacy (ms)':>12} {'automaton (ms)':>15} {'speedup':>8} "
+                          f"{'in-word hits':>13}  results")
+
+        for length in options['words'].split(','):
+            length = int(length)
+            messages = [
+                self._message(rng, symptoms, length, options['density'])
+                for _ in range(options['messages'])
+            ]
+
+            mismatches = sum(
+                1 for message in messages
+                if set(extract_symptoms(message)) != reference_extract_symptoms(message)
+            )
+            # Matches the old scan reported that are not whole-word mentions
+            false_hits = sum(
+                len(set(legacy_extract_symptoms(message)) - reference_extract_symptoms(message))
+                for message in messages
+            )
+
+            legacy = self._time(legacy_extract_symptoms, messages)
+            automaton = self._time(extract_symptoms, messages)
+
+            status = 'correct' if not mismatches else f'{mismatches} MISMATCHES'
+            self.stdout.write(
+                f"{length:>7} {legacy:>12.3f} {automaton:>15.3f} {legacy / automaton:>7.1f}x "
+                f"{false_hits:>13}  {status}"
+            )
+            if mismatches:
+                self.stderr.write(self.style.ERROR(f"Automaton differs from reference at {length} words"))
+
+    def _message(self, rng, symptoms, length, density):
+        words = []
+        while len(words) < length:
+            if rng.random() < density:
+                symptom = rng.choice(symptoms)
+                # Mix the underscore and the spoken form, as users paste both
+                words.append(symptom if rng.random() < 0.5 else symptom.replace('_', ' '))
+            else:
+                words.append(rng.choice(FILLER_WORDS))
+        return ' '.join(words) + '.'
+
+    def _time(self, func, messages):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        return (time.perf_counter() - start) / len(messages) * 1e3
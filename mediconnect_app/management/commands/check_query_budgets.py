@@ -0,0 +1,325 @@
+import json
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+)
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from mediconnect_app import urls as app_urls
+from mediconnect_app.models import (
+    Appointment, Checkup, Conversation, CustomUser, DoctorProfile, LabTest, MedicalForm, MedicalTag, Medication,
+    Message, PatientProfile, Prescription
+)
+from mediconnect_app.uploads import store_medical_record
+
+# Most queries one request to each named URL in mediconnect_app/urls.py may run,
+# for any of the roles walked (anonymous, patient, doctor). Every named URL needs
+# an entry here or in SKIPPED_URLS; budgets must not grow with the amount of data.
+QUERY_BUDGETS = {
+    'login': 2,
+    'signup_role': 2,
+    'doctor_signup': 2,
+    'patient_signup': 2,
+    'complete_medical_form': 4,
+    'dashboard': 2,
+    'patient_dashboard': 7,
+    'doctor_dashboard': 6,
+    'patient_profile': 6,
+    'edit_patient_profile': 3,
+    'doctor_profile': 5,
+    'edit_doctor_profile': 3,
+    'inbox': 3,
+    'conversation_detail': 8,
+    'send_message': 3,
+    'book_appointment': 3,
+    'appointments_list': 4,
+    'doctor_appointments_list': 5,
+    'update_appointment_status': 7,
+    'appointment_detail': 4,
+    'medical_records_list': 5,
+    'delete_medical_record': 3,
+    'doctor_patients_list': 4,
+    'doctor_patient_detail': 10,
+    'symptom_checker': 2,
+    'record_checkup': 5,
+    'checkup_detail': 4,
+    'add_prescription': 3,
+    'prescriptions_list': 4,
+    'medications_list': 5,
+    'edit_medication': 3,
+    'chatbot': 2,
+    'search_doctors': 3,
+    'doctor_availability': 4,
+    'doctor_availability_range': 4,
+    'predict_symptoms': 2,
+    'prediction_cache_stats': 2,
+    'doctor_stats_report': 3,
+    'cohort_report': 3,
+}
+
+# Changelists of every model registered with the admin, walked as a superuser
+ADMIN_CHANGELIST_BUDGET = 7
+
+# Staff-only reports, also walked as the superuser
+STAFF_URLS = ('doctor_stats_report', 'cohort_report')
+
+SKIPPED_URLS = {
+    'logout': 'ends the session the walk depends on',
+    'message_stream': 'long-lived event stream, only meaningful under ASGI',
+}
+
+# Query strings for views that need them (dated ones are added by _seed)
+QUERY_STRINGS = {
+    'search_doctors': {'q': 'Budget'},
+    'predict_symptoms': {'symptoms': ['itching', 'skin_rash']},
+    'cohort_report': {'spec': json.dumps({
+        'age': {'min': 18}, 'chronic_diseases': ['Diabetes'], 'vaccines': {'none': ['Influenza']},
+        'latest_checkup': {'blood_pressure_systolic': {'gt': 100}},
+    })},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database, request every named URL as an anonymous user, a patient '
+        'and a doctor (and the admin changelists as staff), and fail if any view runs more '
+        'queries than its budget in QUERY_BUDGETS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=40, help="Patients seeded on the doctor's list")
+        parser.add_argument('--rows', type=int, default=25,
+                            help='Appointments, checkups, messages... seeded for the walking patient, enough to fill a page')
+        parser.add_argument('--max-ms', type=float, default=None, help='Also fail any request slower than this')
+        parser.add_argument('--only', action='append', default=[], help='Only walk these URL names (repeatable)')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        media_root = tempfile.mkdtemp(prefix='query-budgets-')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(MEDIA_ROOT=media_root, CHECKUP_PREDICTION_ASYNC=False, DEBUG=False):
+                world = self._seed(options['patients'], options['rows'])
+                results = self._walk(world, set(options['only']))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        self._report(results, options['max_ms'])
+
+    # Walking
+
+    def _targets(self, world):
+        """(url name, role, path, query params, budget) for every request to make."""
+        patterns = [p for p in get_resolver(app_urls).url_patterns if p.name]
+        unbudgeted = [p.name for p in patterns if p.name not in QUERY_BUDGETS and p.name not in SKIPPED_URLS]
+        if unbudgeted:
+            raise CommandError(f"No query budget declared for: {', '.join(unbudgeted)}")
+
+        for pattern in patterns:
+            if pattern.name in SKIPPED_URLS:
+                continue
+            roles = ('anonymous', 'patient', 'doctor') + (('staff',) if pattern.name in STAFF_URLS else ())
+            for role in roles:
+                kwargs = {name: world['kwargs'][role][name] for name in pattern.pattern.converters}
+                path = reverse(pattern.name, kwargs=kwargs)
+                params = {**QUERY_STRINGS.get(pattern.name, {}), **world['params'].get(pattern.name, {})}
+                yield pattern.name, role, path, params, QUERY_BUDGETS[pattern.name]
+
+        for model in admin.site._registry:
+            name = f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist'
+            yield name, 'staff', reverse(name), {}, ADMIN_CHANGELIST_BUDGET
+
+    def _walk(self, world, only):
+        # Errors are reported as 500s alongside the budgets instead of stopping the walk
+        clients = {'anonymous': Client(raise_request_exception=False)}
+        for role in ('patient', 'doctor', 'staff'):
+            clients[role] = Client(raise_request_exception=False)
+            clients[role].force_login(world['users'][role])
+
+        results = []
+        for name, role, path, params, budget in self._targets(world):
+            if only and name not in only:
+                continue
+            # Cold caches: the budget covers the worst case, not a warm hit
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = clients[role].get(path, params)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            statements = [query['sql'] for query in queries.captured_queries]
+            results.append({
+                'name': name,
+                'role': role,
+                'path': path,
+                'status': response.status_code,
+                'queries': len(statements),
+                'budget': budget,
+                'query_ms': sum(float(query['time']) for query in queries.captured_queries) * 1000,
+                'total_ms': elapsed_ms,
+                'repeated': Counter(statements).most_common(1)[0] if statements else ('', 0),
+                'statements': statements,
+            })
+        return results
+
+    def _report(self, results, max_ms):
+        failures = []
+        self.stdout.write(f"{'url':<45} {'role':<9} {'status':>6} {'queries':>8} {'budget':>6} {'query ms':>9} {'total ms':>9}")
+        for result in results:
+            problems = []
+            if result['queries'] > result['budget']:
+                problems.append(f"{result['queries']} queries > budget {result['budget']}")
+            if result['status'] >= 500:
+                problems.append(f"status {result['status']}")
+            if max_ms is not None and result['total_ms'] > max_ms:
+                problems.append(f"{result['total_ms']:.0f}ms > {max_ms:.0f}ms")
+
+            line = (
+                f"{result['name']:<45} {result['role']:<9} {result['status']:>6} {result['queries']:>8} "
+                f"{result['budget']:>6} {result['query_ms']:>9.1f} {result['total_ms']:>9.1f}"
+            )
+            if problems:
+                failures.append((result, problems))
+                self.stdout.write(self.style.ERROR(f"{line}  {'; '.join(problems)}"))
+            elif self.verbosity >= 1:
+                self.stdout.write(line)
+
+        for result, problems in failures:
+            sql, count = result['repeated']
+            self.stderr.write(f"\n{result['name']} as {result['role']} ({result['path']}): {'; '.join(problems)}")
+            if count > 1:
+                # The usual N+1 signature: one statement run once per row
+                self.stderr.write(f"  ran {count} times: {sql[:300]}")
+            if self.verbosity >= 2:
+                for statement in result['statements']:
+                    self.stderr.write(f"  {statement}")
+
+        total_queries = sum(result['queries'] for result in results)
+        self.stdout.write(f"\n{len(results)} requests, {total_queries} queries")
+        if failures:
+            raise CommandError(f"{len(failures)} requests over budget")
+        self.stdout.write(self.style.SUCCESS('Every view is within its query budget'))
+
+    # Seeding
+
+    def _seed(self, patient_count, rows):
+        """
+        A doctor with `patient_count` patients, one of whom (the walking patient)
+        has `rows` of everything: appointments, checkups with lab tests and
+        prescriptions, medications, medical records and messages.
+        """
+        today = timezone.localdate()
+        staff = CustomUser.objects.create_superuser(email='staff@budget.invalid', password=None)
+        doctors = [self._doctor(i) for i in range(3)]
+        doctor = doctors[0]
+        patients = [self._patient(i) for i in range(patient_count)]
+        patient = patients[0]
+
+        for i, other in enumerate(patients[1:]):
+            Appointment.objects.create(
+                patient=other, doctor=doctor, date=today - timedelta(days=i % 60), time=dt_time(8 + i % 9),
+                reason='Follow-up', status='completed'
+            )
+
+        appointments = []
+        for i in range(rows):
+            day = today + timedelta(days=i - rows // 2)
+            appointments.append(Appointment.objects.create(
+                patient=patient, doctor=doctors[i % len(doctors)], date=day, time=dt_time(9 + i % 8, 30),
+                reason=f'Visit {i}', status='completed' if day < today else 'scheduled'
+            ))
+
+        medical_form = MedicalForm.objects.create(
+            patient=patient, has_chronic_diseases=True, has_allergies=True, allergies='Penicillin',
+            has_family_history=True
+        )
+        medical_form.set_tags({
+            MedicalTag.CHRONIC_DISEASE: ['Diabetes', 'Hypertension'],
+            MedicalTag.VACCINE: ['BCG', 'MMR', 'Influenza'],
+            MedicalTag.FAMILY_HISTORY: ['Heart Disease'],
+        })
+        for i in range(rows):
+            checkup = Checkup.objects.create(
+                patient=patient, doctor=doctor, heart_rate=70 + i % 20, blood_pressure_systolic=120 + i % 30,
+                blood_pressure_diastolic=80, temperature=98.6, oxygen_saturation=98, weight=70, height=175,
+                symptoms='fever and cough', diagnosis='Common cold'
+            )
+            LabTest.objects.bulk_create([
+                LabTest(checkup=checkup, test_name=name, result_value='1.0', unit='mg/dL')
+                for name in ('Glucose', 'Cholesterol', 'Hemoglobin')
+            ])
+            for name in ('Paracetamol', 'Ibuprofen'):
+                prescription = Prescription.objects.create(
+                    checkup=checkup, patient=patient, doctor=doctor, medication_name=name,
+                    dosage='500mg', frequency='Twice daily', duration='5 days'
+                )
+                Medication.objects.create(
+                    patient=patient, prescription=prescription, medication_name=name, dosage='500mg',
+                    frequency='Twice daily', status='active' if i % 2 else 'completed', start_date=today - timedelta(days=i)
+                )
+            store_medical_record(patient, ContentFile(f'scan {i}'.encode(), name=f'scan-{i}.txt'), f'Scan {i}')
+
+        for i in range(rows):
+            sender, recipient = (patient.user, doctor.user) if i % 2 else (doctor.user, patient.user)
+            Message.objects.create(sender=sender, recipient=recipient, subject=f'Message {i}', body='Hello')
+        for other in patients[1:]:
+            Message.objects.create(sender=other.user, recipient=doctor.user, subject='Question', body='Hello')
+
+        conversation = Conversation.objects.get(user_low=min(patient.user_id, doctor.user_id),
+                                                user_high=max(patient.user_id, doctor.user_id))
+        shared = {
+            'conversation_id': conversation.id,
+            'appointment_id': appointments[-1].id,
+            'new_status': 'confirmed',
+            'record_id': patient.medical_records.first().id,
+            'patient_id': patient.id,
+            'checkup_id': patient.checkups.first().id,
+            'medication_id': patient.medications.first().id,
+            'doctor_id': doctor.id,
+        }
+        return {
+            'params': {
+                'doctor_availability': {'date': today.isoformat()},
+                'doctor_availability_range': {'start': today.isoformat(), 'days': 7},
+                'doctor_stats_report': {'start': (today - timedelta(days=30)).isoformat(), 'end': today.isoformat()},
+            },
+            'users': {'patient': patient.user, 'doctor': doctor.user, 'staff': staff},
+            'kwargs': {
+                'anonymous': {**shared, 'user_id': patient.user_id},
+                'patient': {**shared, 'user_id': patient.user_id},
+                'doctor': {**shared, 'user_id': doctor.user_id},
+            },
+        }
+
+    def _doctor(self, i):
+        user = CustomUser.objects.create_user(
+            email=f'doctor{i}@budget.invalid', password=None, first_name='Budget', last_name=f'Doctor{i}', role='doctor'
+        )
+        return DoctorProfile.objects.create(
+            user=user, phone='10000000', specialization='General Practice', years_of_experience=10,
+            license_number=f'BUDGET-{i}', clinic_name='Budget Clinic', clinic_address='-'
+        )
+
+    def _patient(self, i):
+        user = CustomUser.objects.create_user(
+            email=f'patient{i}@budget.invalid', password=None, first_name=f'Patient{i}', last_name='Budget', role='patient'
+        )
+        return PatientProfile.objects.create(
+            user=user, phone='10000000', date_of_birth=datetime(1950 + i % 50, 1 + i % 12, 1).date(),
+            gender='MF'[i % 2], city='Paris', country='France'
+        )
@@ -0,0 +1,138 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from mediconnect_app.disease_model import get_naive_bayes_model, load_training_data
+from mediconnect_app.utils import predict_disease, predict_disease_uncached
+
+from .train_disease_model import DEFAULT_CSV
+
+
+def get_backend(name):
+    """Resolve a backend name or dotted path to a callable(symptoms_list) -> predictions."""
+    if name == 'patterns':
+        return predict_disease_uncached
+    if name == 'naive_bayes':
+        return get_naive_bayes_model().predict
+    if name == 'predict_disease':
+        # Whatever settings.DISEASE_PREDICTION_BACKEND selects, including the LRU cache
+        return predict_disease
+    try:
+        return import_string(name)
+    except ImportError as e:
+        raise CommandError(f"Unknown backend '{name}': {e}")
+
+
+class Command(BaseCommand):
+    help = 'Replay a labelled symptom CSV through a prediction backend and report accuracy and speed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', default='patterns',
+                            help="'patterns', 'naive_bayes', 'predict_disease' or a dotted path to a callable")
+        parser.add_argument('--csv', default=DEFAULT_CSV, help='Labelled CSV with a prognosis column')
+        parser.add_argument('--repeat', type=int, default=20, help='Timing passes over the dataset')
+        parser.add_argument('--output', help='Write the JSON report to this path')
+        parser.add_argument('--baseline', help='Previous JSON report to compare against')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['csv']):
+            raise CommandError(f"CSV '{options['csv']}' not found")
+
+        backend = get_backend(options['backend'])
+        symptoms, diseases, X, y = load_training_data(options['csv'])
+        cases = [
+            ([symptoms[i] for i in np.flatnonzero(row)], diseases[label])
+            for row, label in zip(X, y)
+        ]
+
+        # Accuracy (names are compared stripped: DISEASE_PATTERNS has 'Diabetes ' etc.)
+        per_disease = {}
+        top1_hits = top5_hits = 0
+        for case_symptoms, expected in cases:
+            ranked = [p['disease'].strip() for p in backend(case_symptoms)]
+            top1 = bool(ranked) and ranked[0] == expected
+            top5 = expected in ranked[:5]
+            top1_hits += top1
+            top5_hits += top5
+            stats = per_disease.setdefault(expected, {'rows': 0, 'top1_hits': 0, 'top5_hits': 0})
+            stats['rows'] += 1
+            stats['top1_hits'] += top1
+            stats['top5_hits'] += top5
+
+        # Throughput and latency, timing every call individually
+        latencies = []
+        for _ in range(options['repeat']):
+            for case_symptoms, _expected in cases:
+                start = time.perf_counter_ns()
+                backend(case_symptoms)
+                latencies.append(time.perf_counter_ns() - start)
+        latencies = np.array(latencies, dtype=np.float64) / 1e6
+        total_seconds = latencies.sum() / 1e3
+
+        report = {
+            'backend': options['backend'],
+            'dataset': os.path.basename(options['csv']),
+            'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'rows': len(cases),
+            'top1_accuracy': round(top1_hits / len(cases), 4),
+            'top5_accuracy': round(top5_hits / len(cases), 4),
+            'predictions_per_second': round(len(latencies) / total_seconds, 1),
+            'latency_ms': {
+                'p50': round(float(np.percentile(latencies, 50)), 4),
+                'p99': round(float(np.percentile(latencies, 99)), 4),
+                'mean': round(float(latencies.mean()), 4),
+            },
+            'per_disease': {
+                disease: {
+                    'rows': stats['rows'],
+                    'top1_recall': round(stats['top1_hits'] / stats['rows'], 4),
+                    'top5_recall': round(stats['top5_hits'] / stats['rows'], 4),
+                }
+                for disease, stats in sorted(per_disease.items())
+            },
+        }
+
+        self._print_report(report)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if options['baseline']:
+            self._compare(report, options['baseline'])
+
+    def _print_report(self, report):
+        self.stdout.write(f"Backend: {report['backend']} on {report['rows']} rows of {report['dataset']}")
+        self.stdout.write(f"Top-1 accuracy: {report['top1_accuracy']:.2%}")
+        self.stdout.write(f"Top-5 accuracy: {report['top5_accuracy']:.2%}")
+        self.stdout.write(f"Throughput: {report['predictions_per_second']:.0f} predictions/s")
+        latency = report['latency_ms']
+        self.stdout.write(f"Latency: p50 {latency['p50']:.3f} ms, p99 {latency['p99']:.3f} ms")
+
+        missed = [name for name, stats in report['per_disease'].items() if stats['top1_recall'] < 1]
+        if missed:
+            self.stdout.write(f"Diseases with top-1 recall below 100%: {', '.join(missed)}")
+
+    def _compare(self, report, baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        self.stdout.write(f"Compared with {baseline_path} ({baseline.get('backend')}):")
+        for key in ('top1_accuracy', 'top5_accuracy', 'predictions_per_second'):
+            self.stdout.write(f"  {key}: {baseline[key]} -> {report[key]}")
+        for key in ('p50', 'p99'):
+            self.stdout.write(f"  latency {key} ms: {baseline['latency_ms'][key]} -> {report['latency_ms'][key]}")
+
+        regressed = [
+            key for key in ('top1_accuracy', 'top5_accuracy')
+            if report[key] < baseline[key]
+        ]
+        if regressed:
+            raise CommandError(f"Accuracy regressed against baseline: {', '.join(regressed)}")
@@ -0,0 +1,64 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mediconnect_app.cohorts import CohortSpecError, compile_cohort
+
+
+class Command(BaseCommand):
+    help = (
+        'Print the ids of the patients matching a cohort spec (see mediconnect_app.cohorts), one per line, '
+        'streamed from a single query; timing goes to stderr'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('spec', nargs='?', help='Cohort spec as JSON; read from --file or stdin when omitted')
+        parser.add_argument('--file', help='Read the spec from this JSON file')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the cursor at a time')
+        parser.add_argument('--count', action='store_true', help='Print only the number of matching patients')
+        parser.add_argument('--sql', action='store_true', help='Print the compiled SQL and its query plan instead')
+
+    def handle(self, *args, **options):
+        spec = self._read_spec(options)
+        try:
+            patients = compile_cohort(spec)
+        except CohortSpecError as error:
+            raise CommandError(f'Invalid cohort spec: {error}')
+        ids = patients.values_list('pk', flat=True)
+
+        if options['sql']:
+            self.stdout.write(str(ids.query))
+            self.stdout.write('\nQuery plan:')
+            self.stdout.write(ids.explain())
+            return
+
+        start = time.perf_counter()
+        first_row_ms = None
+        count = 0
+        for patient_id in ids.iterator(chunk_size=options['chunk_size']):
+            if first_row_ms is None:
+                first_row_ms = (time.perf_counter() - start) * 1000
+            count += 1
+            if not options['count']:
+                self.stdout.write(str(patient_id))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if options['count']:
+            self.stdout.write(str(count))
+        first_row = f", first id after {first_row_ms:.1f}ms" if first_row_ms is not None else ''
+        self.stderr.write(f"{count} patients in {elapsed_ms:.1f}ms{first_row}")
+
+    def _read_spec(self, options):
+        if options['file']:
+            with open(options['file']) as spec_file:
+                text = spec_file.read()
+        elif options['spec']:
+            text = options['spec']
+        else:
+            text = sys.stdin.read()
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as error:
+            raise CommandError(f'The cohort spec is not valid JSON: {error}')
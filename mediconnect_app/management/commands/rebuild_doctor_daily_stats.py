@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mediconnect_app.dashboard import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute DoctorDailyStats from appointments and prescriptions (repair after bulk writes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', type=int, action='append', dest='doctors',
+                            help='Only rebuild this DoctorProfile id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = rebuild_daily_stats(doctor_ids=options['doctors'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        scope = f"doctors {', '.join(map(str, options['doctors']))}" if options['doctors'] else 'all doctors'
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily rows for {scope} in {elapsed:.2f}s"))
@@ -0,0 +1,46 @@
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mediconnect_app.disease_model import MODEL_KINDS, load_training_data, save_model, train_naive_bayes
+
+DEFAULT_CSV = os.path.join(settings.BASE_DIR, 'mediconnect_app', 'templates', 'Testing (1).csv')
+
+
+class Command(BaseCommand):
+    help = 'Train a Naive Bayes disease model from a symptom CSV and save it as an .npz artifact'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', default=DEFAULT_CSV, help='Training CSV with a prognosis column')
+        parser.add_argument('--output', default=None, help='Artifact path (defaults to settings.DISEASE_MODEL_PATH)')
+        parser.add_argument('--kind', choices=MODEL_KINDS, default='multinomial',
+                            help='multinomial only scores present symptoms, which suits the small bundled dataset')
+        parser.add_argument('--alpha', type=float, default=1.0, help='Laplace smoothing')
+
+    def handle(self, *args, **options):
+        output = options['output'] or str(settings.DISEASE_MODEL_PATH)
+        if not os.path.exists(options['csv']):
+            raise CommandError(f"Training CSV '{options['csv']}' not found")
+
+        start = time.perf_counter()
+        symptoms, diseases, X, y = load_training_data(options['csv'])
+        if not len(y):
+            raise CommandError('Training CSV has no rows')
+
+        weights, bias = train_naive_bayes(X, y, len(diseases), kind=options['kind'], alpha=options['alpha'])
+
+        # Symptoms seen at least once per disease, reported as matched_symptoms
+        class_symptoms = np.zeros((len(diseases), len(symptoms)), dtype=bool)
+        for row, label in zip(X, y):
+            class_symptoms[label] |= row.astype(bool)
+
+        save_model(output, symptoms, diseases, weights, bias, class_symptoms, options['kind'])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained {options['kind']} model on {len(y)} rows, {len(diseases)} diseases, "
+            f"{len(symptoms)} symptoms in {elapsed:.2f}s -> {output} ({os.path.getsize(output)} bytes)"
+        ))
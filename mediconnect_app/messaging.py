@@ -0,0 +1,67 @@
+"""
+Conversations between two users, with denormalized inbox state.
+
+Each Message belongs to the Conversation of its sender/recipient pair, which
+is found or created when the message is first saved (signals.py). Sending
+moves the conversation's last-message pointer and bumps the recipient's
+unread_count with an F() update; mark_conversation_read() clears it. The
+inbox therefore reads one ConversationParticipant row per conversation and
+never counts or scans messages. Both changes are pushed to open message
+streams (live.py) once committed.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .live import publish_read
+from .models import Conversation, ConversationParticipant, Message
+
+
+def _ordered_pair(user_a_id, user_b_id):
+    return (user_a_id, user_b_id) if user_a_id <= user_b_id else (user_b_id, user_a_id)
+
+
+def _new_participants(participant_model, conversation, low, high):
+    """Inbox rows for a new conversation: one per user, so just one when a user writes to themselves."""
+    participants = [participant_model(conversation=conversation, user_id=low, other_user_id=high)]
+    if low != high:
+        participants.append(participant_model(conversation=conversation, user_id=high, other_user_id=low))
+    return participants
+
+
+def get_or_create_conversation(user_a_id, user_b_id):
+    """The conversation for a pair of users, created with both participants if new."""
+    low, high = _ordered_pair(user_a_id, user_b_id)
+    conversation = Conversation.objects.filter(user_low_id=low, user_high_id=high).first()
+    if conversation:
+        return conversation
+    try:
+        with transaction.atomic():
+            conversation = Conversation.objects.create(user_low_id=low, user_high_id=high)
+            ConversationParticipant.objects.bulk_create(
+                _new_participants(ConversationParticipant, conversation, low, high)
+            )
+    except IntegrityError:
+        # Another request created it first
+        conversation = Conversation.objects.get(user_low_id=low, user_high_id=high)
+    return conversation
+
+
+def record_message(message):
+    """Point the conversation at a newly sent message and count it as unread for the recipient."""
+    Conversation.objects.filter(pk=message.conversation_id).update(
+        last_message=message, last_message_at=message.created_at
+    )
+    participants = ConversationParticipant.objects.filter(conversation_id=message.conversation_id)
+    participants.filter(user_id=message.sender_id).update(last_message_at=message.created_at)
+    participants.filter(user_id=message.recipient_id).update(
+        last_message_at=message.created_at,
+        unread_count=F('unread_count') + (0 if message.is_read else 1)
+    )
+
+
+def mark_conversation_read(conversation, user):
+    """Mark every message `user` received in the conversation as read."""
+    with transaction.atomic():
+        Message.objects.filter(conversation=conversation, recipient=user, is_read=False).update(is_read=True)
+        ConversationParticipant.objects.filter(conversation=conversation, user=user).update(unread_count=0)
+        transaction.on_commit(lambda: publish_read(user.id, conversation.id))
@@ -0,0 +1,146 @@
+# Generated by Django 4.2 on 2026-10-17 18:39
+
+import re
+from datetime import datetime, time, timedelta
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copies of the scheduling.py helpers as they were when this migration
+# was written, so later changes to that module can't alter what it does
+
+SLOT_MINUTES = 30
+# Hours used when the text can't be parsed
+DEFAULT_WORKING_INTERVALS = [(time(9, 0), time(17, 0))]
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+TIME_RANGE_RE = re.compile(
+    r'(\d{1,2})(?:[:.](\d{2}))?\s*([ap]\.?m\.?)?\s*(?:-|–|to)\s*(\d{1,2})(?:[:.](\d{2}))?\s*([ap]\.?m\.?)?',
+    re.IGNORECASE
+)
+DAY_RANGE_RE = re.compile(
+    r'\b(mon|tue|wed|thu|fri|sat|sun)[a-z]*\.?(?:\s*(?:-|–|to)\s*(mon|tue|wed|thu|fri|sat|sun)[a-z]*\.?)?',
+    re.IGNORECASE
+)
+
+
+def to_time(hour, minute, meridiem):
+    hour = int(hour)
+    minute = int(minute or 0)
+    if meridiem:
+        meridiem = meridiem[0].lower()
+        if meridiem == 'p' and hour < 12:
+            hour += 12
+        elif meridiem == 'a' and hour == 12:
+            hour = 0
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"Invalid time {hour}:{minute:02d}")
+    return time(hour, minute)
+
+
+def parse_working_hours(text):
+    """Free-text hours -> [(weekday, start, end)]; [] if nothing parses."""
+    text = text or ''
+    weekdays = set()
+    for first, last in DAY_RANGE_RE.findall(text):
+        start = WEEKDAYS.index(first.lower())
+        end = WEEKDAYS.index(last.lower()) if last else start
+        day = start
+        while True:
+            weekdays.add(day)
+            if day == end:
+                break
+            day = (day + 1) % 7
+    if not weekdays:
+        weekdays = set(range(7))
+
+    intervals = []
+    for start_h, start_m, start_ampm, end_h, end_m, end_ampm in TIME_RANGE_RE.findall(text):
+        try:
+            start = to_time(start_h, start_m, start_ampm)
+            end = to_time(end_h, end_m, end_ampm)
+        except ValueError:
+            continue
+        if end <= start and not end_ampm and end.hour < 12:
+            end = time(end.hour + 12, end.minute)
+        if end > start:
+            intervals.append((start, end))
+
+    return [(day, start, end) for day in sorted(weekdays) for start, end in intervals]
+
+
+def build_slot_templates(intervals, slot_minutes):
+    """(weekday, start, end) working intervals -> {weekday: ['HH:MM', ...]}; there are no breaks yet."""
+    step = timedelta(minutes=slot_minutes)
+    day = datetime(2000, 1, 3)  # any Monday; only the time part matters
+
+    templates = {}
+    for weekday in range(7):
+        slots = set()
+        for d, start, end in intervals:
+            if d != weekday:
+                continue
+            current = datetime.combine(day, start)
+            finish = datetime.combine(day, end)
+            while current + step <= finish:
+                slots.add(current.time())
+                current += step
+        templates[str(weekday)] = [slot.strftime('%H:%M') for slot in sorted(slots)]
+    return templates
+
+
+def create_schedules_from_working_hours(apps, schema_editor):
+    DoctorProfile = apps.get_model('mediconnect_app', 'DoctorProfile')
+    DoctorSchedule = apps.get_model('mediconnect_app', 'DoctorSchedule')
+    ScheduleInterval = apps.get_model('mediconnect_app', 'ScheduleInterval')
+
+    for doctor in DoctorProfile.objects.filter(schedule__isnull=True).iterator():
+        parsed = parse_working_hours(doctor.working_hours) or [
+            (weekday, start, end) for weekday in range(7) for start, end in DEFAULT_WORKING_INTERVALS
+        ]
+        schedule = DoctorSchedule.objects.create(
+            doctor=doctor,
+            slot_minutes=SLOT_MINUTES,
+            slot_templates=build_slot_templates(parsed, SLOT_MINUTES),
+        )
+        ScheduleInterval.objects.bulk_create([
+            ScheduleInterval(schedule=schedule, weekday=weekday, start_time=start, end_time=end, kind='work')
+            for weekday, start, end in parsed
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediconnect_app', '0004_alter_prescription_options_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=30, validators=[django.core.validators.MinValueValidator(5), django.core.validators.MaxValueValidator(240)])),
+                ('slot_templates', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='schedule', to='mediconnect_app.doctorprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScheduleInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('kind', models.CharField(choices=[('work', 'Working hours'), ('break', 'Break')], default='work', max_length=10)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intervals', to='mediconnect_app.doctorschedule')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+        migrations.RunPython(create_schedules_from_working_hours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-17 18:42
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Appointment.ACTIVE_STATUSES and SLOT_TAKEN_MESSAGE (models.py) as they were when
+# this migration was written; named once so the backfill and constraint agree
+ACTIVE_STATUSES = ('scheduled', 'confirmed')
+SLOT_TAKEN_MESSAGE = 'This time slot is already booked. Please choose another one.'
+
+
+def cancel_double_bookings(apps, schema_editor):
+    # Existing double bookings would make the constraint fail; keep the first
+    # booking of each slot and cancel the later ones with a note.
+    Appointment = apps.get_model('mediconnect_app', 'Appointment')
+    active = Appointment.objects.filter(status__in=ACTIVE_STATUSES)
+    clashes = (
+        active.values('doctor_id', 'date', 'time')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+    )
+    for slot in clashes:
+        duplicates = active.filter(
+            doctor_id=slot['doctor_id'], date=slot['date'], time=slot['time']
+        ).order_by('created_at', 'id')[1:]
+        for appointment in duplicates:
+            appointment.status = 'cancelled'
+            appointment.notes = (appointment.notes + '\n' if appointment.notes else '') + \
+                'Cancelled automatically: slot was double-booked.'
+            appointment.save(update_fields=['status', 'notes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediconnect_app', '0005_doctor_schedules'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ACTIVE_STATUSES)), fields=('doctor', 'date', 'time'), name='unique_active_doctor_slot', violation_error_message=SLOT_TAKEN_MESSAGE),
+        ),
+    ]
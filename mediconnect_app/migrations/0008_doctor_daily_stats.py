@@ -0,0 +1,64 @@
+# Generated by Django 4.2 on 2026-10-17 18:48
+
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate
+
+
+def build_daily_stats(apps, schema_editor):
+    # A frozen copy of dashboard.rebuild_daily_stats() as it was when this migration was written
+    Appointment = apps.get_model('mediconnect_app', 'Appointment')
+    Prescription = apps.get_model('mediconnect_app', 'Prescription')
+    DoctorDailyStats = apps.get_model('mediconnect_app', 'DoctorDailyStats')
+
+    rows = defaultdict(Counter)
+    appointments = Appointment.objects.all()
+    for row in appointments.values('doctor_id', 'date', 'status').annotate(n=Count('id')).order_by():
+        rows[(row['doctor_id'], row['date'])][row['status']] += row['n']
+    first_visits = appointments.values('doctor_id', 'patient_id').annotate(first=Min('date')).order_by()
+    for row in first_visits.iterator():
+        rows[(row['doctor_id'], row['first'])]['new_patients'] += 1
+    by_day = Prescription.objects.annotate(day=TruncDate('created_at')).values('doctor_id', 'day').annotate(
+        n=Count('id')
+    ).order_by()
+    for row in by_day:
+        rows[(row['doctor_id'], row['day'])]['prescriptions'] += row['n']
+
+    DoctorDailyStats.objects.bulk_create(
+        [DoctorDailyStats(doctor_id=doctor_id, day=day, **counts) for (doctor_id, day), counts in rows.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediconnect_app', '0007_doctor_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('scheduled', models.IntegerField(default=0)),
+                ('confirmed', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('prescriptions', models.IntegerField(default=0)),
+                ('new_patients', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='mediconnect_app.doctorprofile')),
+            ],
+            options={
+                'verbose_name_plural': 'doctor daily stats',
+                'ordering': ['-day'],
+                'unique_together': {('doctor', 'day')},
+            },
+        ),
+        migrations.RunPython(build_daily_stats, migrations.RunPython.noop),
+    ]
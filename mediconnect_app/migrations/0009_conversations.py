@@ -0,0 +1,127 @@
+# Generated by Django 4.2 on 2026-10-17 18:51
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+from django.db.models import Count, Q
+import django.utils.timezone
+
+
+def group_messages_into_conversations(apps, schema_editor):
+    """
+    Group existing messages into conversations, one per user pair, and set each
+    conversation's last-message pointer and per-participant unread counts.
+    """
+    Conversation = apps.get_model('mediconnect_app', 'Conversation')
+    ConversationParticipant = apps.get_model('mediconnect_app', 'ConversationParticipant')
+    Message = apps.get_model('mediconnect_app', 'Message')
+
+    pairs = {
+        (min(sender_id, recipient_id), max(sender_id, recipient_id))
+        for sender_id, recipient_id in Message.objects.filter(
+            conversation__isnull=True
+        ).values_list('sender_id', 'recipient_id').distinct()
+    }
+    for low, high in pairs:
+        with transaction.atomic():
+            conversation, created = Conversation.objects.get_or_create(user_low_id=low, user_high_id=high)
+            if created:
+                # One row per user, so a single one when users wrote to themselves
+                ConversationParticipant.objects.bulk_create([
+                    ConversationParticipant(conversation=conversation, user_id=user_id, other_user_id=other_id)
+                    for user_id, other_id in {(low, high), (high, low)}
+                ])
+            thread = Message.objects.filter(
+                Q(sender_id=low, recipient_id=high) | Q(sender_id=high, recipient_id=low)
+            )
+            thread.filter(conversation__isnull=True).update(conversation=conversation)
+
+            last = thread.order_by('-created_at', '-id').first()
+            Conversation.objects.filter(pk=conversation.pk).update(
+                last_message=last, last_message_at=last.created_at
+            )
+            unread = dict(
+                thread.filter(is_read=False).values_list('recipient_id').annotate(n=Count('id')).order_by()
+            )
+            for user_id in (low, high):
+                ConversationParticipant.objects.filter(conversation=conversation, user_id=user_id).update(
+                    last_message_at=last.created_at, unread_count=unread.get(user_id, 0)
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediconnect_app', '0008_doctor_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ConversationParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_message_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='mediconnect_app.conversation'),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='other_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='mediconnect_app.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_high',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_low',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='mediconnect_app.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', '-created_at', 'id'], name='message_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationparticipant',
+            index=models.Index(fields=['user', '-last_message_at', 'id'], name='participant_inbox_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversationparticipant',
+            unique_together={('conversation', 'user')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversation',
+            unique_together={('user_low', 'user_high')},
+        ),
+        migrations.RunPython(group_messages_into_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2 on 2026-10-17 19:12
+
+from django.db import migrations, models
+
+# The medical form checklists when this migration was written, seeded in display order
+VOCABULARY = {
+    'chronic_disease': (
+        'Diabetes', 'Hypertension', 'Asthma', 'Heart Disease', 'Cancer', 'Kidney Disease', 'Liver Disease', 'Other'
+    ),
+    'vaccine': ('BCG', 'Hepatitis B', 'Polio', 'MMR', 'Tetanus', 'Influenza', 'COVID-19'),
+    'family_history': ('Diabetes', 'Hypertension', 'Cancer', 'Heart Disease', 'Other'),
+}
+
+# Old comma separated field -> tag category
+TAG_FIELDS = {
+    'chronic_diseases': 'chronic_disease',
+    'vaccines': 'vaccine',
+    'family_history': 'family_history',
+}
+
+
+def split_fields_into_tags(apps, schema_editor):
+    MedicalForm = apps.get_model('mediconnect_app', 'MedicalForm')
+    MedicalTag = apps.get_model('mediconnect_app', 'MedicalTag')
+    Through = MedicalForm.tags.through
+
+    MedicalTag.objects.bulk_create([
+        MedicalTag(category=category, name=name) for category, names in VOCABULARY.items() for name in names
+    ])
+    # Matched case-insensitively, so "diabetes" joins the Diabetes tag
+    tags = {(tag.category, tag.name.lower()): tag.pk for tag in MedicalTag.objects.all()}
+
+    links = []
+    forms = MedicalForm.objects.values_list('pk', *TAG_FIELDS)
+    for pk, *values in forms.iterator(chunk_size=2000):
+        tag_ids = set()
+        for category, value in zip(TAG_FIELDS.values(), values):
+            for name in (value or '').split(','):
+                name = name.strip()[:100]
+                if not name:
+                    continue
+                # Anything typed outside the checklist is kept as a tag of its own
+                if (category, name.lower()) not in tags:
+                    tags[category, name.lower()] = MedicalTag.objects.create(category=category, name=name).pk
+                tag_ids.add(tags[category, name.lower()])
+        links.extend(Through(medicalform_id=pk, medicaltag_id=tag_id) for tag_id in tag_ids)
+        if len(links) >= 5000:
+            Through.objects.bulk_create(links)
+            links = []
+    Through.objects.bulk_create(links)
+
+
+def join_tags_into_fields(apps, schema_editor):
+    MedicalForm = apps.get_model('mediconnect_app', 'MedicalForm')
+    Through = MedicalForm.tags.through
+
+    values = {}
+    for form_id, category, name in Through.objects.order_by('medicaltag_id').values_list(
+        'medicalform_id', 'medicaltag__category', 'medicaltag__name'
+    ):
+        values.setdefault(form_id, {}).setdefault(category, []).append(name)
+    for form_id, names in values.items():
+        MedicalForm.objects.filter(pk=form_id).update(**{
+            field: ', '.join(names.get(category, [])) for field, category in TAG_FIELDS.items()
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediconnect_app', '0010_composite_access_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicalTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('chronic_disease', 'Chronic disease'), ('vaccine', 'Vaccine'), ('family_history', 'Family history')], max_length=20)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'ordering': ['category', 'id'],
+                'unique_together': {('category', 'name')},
+            },
+        ),
+        migrations.AddField(
+            model_name='medicalform',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='medical_forms', to='mediconnect_app.medicaltag'),
+        ),
+        migrations.RunPython(split_fields_into_tags, join_tags_into_fields),
+        migrations.RemoveField(
+            model_name='medicalform',
+            name='chronic_diseases',
+        ),
+        migrations.RemoveField(
+            model_name='medicalform',
+            name='family_history',
+        ),
+        migrations.RemoveField(
+            model_name='medicalform',
+            name='vaccines',
+        ),
+    ]
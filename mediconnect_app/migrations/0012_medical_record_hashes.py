@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-17 19:19
+
+import os
+
+from django.db import migrations, models
+import mediconnect_app.models
+
+
+BATCH_SIZE = 2000
+
+
+def fill_original_names(apps, schema_editor):
+    # Hashes and sizes need the files read: manage.py backfill_medical_record_hashes
+    MedicalRecord = apps.get_model('mediconnect_app', 'MedicalRecord')
+    batch = []
+    for record in MedicalRecord.objects.filter(original_name='').only('pk', 'file').iterator(chunk_size=BATCH_SIZE):
+        record.original_name = os.path.basename(record.file.name)[:255]
+        batch.append(record)
+        if len(batch) == BATCH_SIZE:
+            MedicalRecord.objects.bulk_update(batch, ['original_name'])
+            batch = []
+    if batch:
+        MedicalRecord.objects.bulk_update(batch, ['original_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediconnect_app', '0011_medical_form_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='medicalrecord',
+            name='file',
+            field=models.FileField(max_length=255, upload_to=mediconnect_app.models.medical_file_path),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['patient', 'sha256'], name='medicalrecord_patient_hash_idx'),
+        ),
+        migrations.RunPython(fill_original_names, migrations.RunPython.noop),
+    ]
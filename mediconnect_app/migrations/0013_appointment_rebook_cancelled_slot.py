@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-17 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mediconnect_app', '0012_medical_record_hashes'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='appointment',
+            unique_together=set(),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'doctor', 'date'], name='appointment_patient_doctor_idx'),
+        ),
+    ]
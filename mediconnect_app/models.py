@@ -37,6 +37,13 @@ class CustomUser(AbstractUser):
     
     def __str__(self):
         return self.email
+    
+    class Meta(AbstractUser.Meta):
+        # Prefix lookups for the doctor autocomplete
+        indexes = [
+            models.Index(fields=['first_name'], name='user_first_name_idx'),
+            models.Index(fields=['last_name'], name='user_last_name_idx'),
+        ]
 
 
 class DoctorProfile(models.Model):
@@ -53,6 +60,78 @@ class DoctorProfile(models.Model):
     
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} - {self.specialization}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['specialization'], name='doctor_specialization_idx'),
+        ]
+
+
+class DoctorSchedule(models.Model):
+    doctor = models.OneToOneField(DoctorProfile, on_delete=models.CASCADE, related_name='schedule')
+    slot_minutes = models.PositiveSmallIntegerField(default=30, validators=[MinValueValidator(5), MaxValueValidator(240)])
+    # Precomputed {weekday: ['HH:MM', ...]} (0 = Monday), rebuilt whenever intervals change
+    slot_templates = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Schedule - Dr. {self.doctor.user.first_name} {self.doctor.user.last_name}"
+    
+    @classmethod
+    def create_from_working_hours(cls, doctor):
+        """Create a schedule from the doctor's free-text working_hours (defaults if unparseable)."""
+        from .scheduling import DEFAULT_WORKING_INTERVALS, parse_working_hours
+        parsed = parse_working_hours(doctor.working_hours) or [
+            (weekday, start, end) for weekday in range(7) for start, end in DEFAULT_WORKING_INTERVALS
+        ]
+        schedule = cls.objects.create(doctor=doctor)
+        ScheduleInterval.objects.bulk_create([
+            ScheduleInterval(schedule=schedule, weekday=weekday, start_time=start, end_time=end)
+            for weekday, start, end in parsed
+        ])
+        schedule.rebuild_slot_templates()
+        return schedule
+    
+    def rebuild_slot_templates(self, save=True):
+        from .scheduling import build_slot_templates
+        intervals = [
+            (i.weekday, i.start_time, i.end_time, i.kind == 'break')
+            for i in self.intervals.all()
+        ]
+        self.slot_templates = build_slot_templates(intervals, self.slot_minutes)
+        if save:
+            DoctorSchedule.objects.filter(pk=self.pk).update(slot_templates=self.slot_templates)
+    
+    def slots_for(self, day):
+        return self.slot_templates.get(str(day.weekday()), [])
+
+
+class ScheduleInterval(models.Model):
+    WEEKDAY_CHOICES = (
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    )
+    KIND_CHOICES = (
+        ('work', 'Working hours'),
+        ('break', 'Break'),
+    )
+    
+    schedule = models.ForeignKey(DoctorSchedule, on_delete=models.CASCADE, related_name='intervals')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='work')
+    
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M} ({self.kind})"
+    
+    class Meta:
+        ordering = ['weekday', 'start_time']
 
 
 class PatientProfile(models.Model):
@@ -79,46 +158,105 @@ class PatientProfile(models.Model):
         return today.year - self.date_of_birth.year - ((today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day))
 
 
+class MedicalTag(models.Model):
+    """One entry of a medical form checklist: a chronic disease, a vaccine or a family condition."""
+    CHRONIC_DISEASE = 'chronic_disease'
+    VACCINE = 'vaccine'
+    FAMILY_HISTORY = 'family_history'
+    CATEGORY_CHOICES = (
+        (CHRONIC_DISEASE, 'Chronic disease'),
+        (VACCINE, 'Vaccine'),
+        (FAMILY_HISTORY, 'Family history'),
+    )
+    # The checklists offered on the medical form, in display order
+    VOCABULARY = {
+        CHRONIC_DISEASE: (
+            'Diabetes', 'Hypertension', 'Asthma', 'Heart Disease', 'Cancer', 'Kidney Disease', 'Liver Disease', 'Other'
+        ),
+        VACCINE: ('BCG', 'Hepatitis B', 'Polio', 'MMR', 'Tetanus', 'Influenza', 'COVID-19'),
+        FAMILY_HISTORY: ('Diabetes', 'Hypertension', 'Cancer', 'Heart Disease', 'Other'),
+    }
+    
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    name = models.CharField(max_length=100)
+    
+    def __str__(self):
+        return f"{self.get_category_display()}: {self.name}"
+    
+    class Meta:
+        ordering = ['category', 'id']
+        unique_together = ('category', 'name')
+
+
 class MedicalForm(models.Model):
     patient = models.OneToOneField(PatientProfile, on_delete=models.CASCADE, related_name='medical_form')
     
-    # Chronic diseases
+    # Chronic diseases, vaccines and family history are MedicalTags
     has_chronic_diseases = models.BooleanField(default=False)
-    chronic_diseases = models.TextField(blank=True, help_text="Comma separated: Diabetes, Hypertension, Asthma, Heart Disease, Cancer, Kidney Disease, Liver Disease, Other")
+    has_family_history = models.BooleanField(default=False)
+    tags = models.ManyToManyField(MedicalTag, blank=True, related_name='medical_forms')
     
     # Allergies
     has_allergies = models.BooleanField(default=False)
     allergies = models.TextField(blank=True)
     
-    # Vaccines
-    vaccines = models.TextField(blank=True, help_text="Comma separated: BCG, Hepatitis B, Polio, MMR, Tetanus, Influenza, COVID-19")
-    
-    # Family history
-    has_family_history = models.BooleanField(default=False)
-    family_history = models.TextField(blank=True, help_text="Comma separated: Diabetes, Hypertension, Cancer, Heart Disease, Other")
-    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Medical Form - {self.patient.user.first_name}"
+    
+    def tag_names(self):
+        """{category: [names]} from tags.all(), so a prefetch is used when there is one."""
+        names = {category: [] for category, _label in MedicalTag.CATEGORY_CHOICES}
+        for tag in self.tags.all():
+            names[tag.category].append(tag.name)
+        return names
+    
+    def set_tags(self, names_by_category):
+        """Replace the form's tags with the given {category: [names]}, adding names not seen before."""
+        wanted = {(category, name) for category, names in names_by_category.items() for name in names}
+        if wanted:
+            MedicalTag.objects.bulk_create(
+                [MedicalTag(category=category, name=name) for category, name in wanted], ignore_conflicts=True
+            )
+        candidates = MedicalTag.objects.filter(name__in={name for _category, name in wanted})
+        self.tags.set([tag for tag in candidates if (tag.category, tag.name) in wanted])
 
 
 def medical_file_path(instance, filename):
+    # Only for files saved without uploads.store_medical_record (e.g. through the admin)
     return os.path.join('medical_records', str(instance.patient.user.id), filename)
 
 
 class MedicalRecord(models.Model):
     patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE, related_name='medical_records')
-    file = models.FileField(upload_to=medical_file_path)
+    # Uploads point at a content-addressed blob shared by every record with the same bytes
+    file = models.FileField(upload_to=medical_file_path, max_length=255)
+    original_name = models.CharField(max_length=255, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     description = models.CharField(max_length=255, blank=True)
     
     def __str__(self):
         return f"Medical Record - {self.patient.user.first_name}"
     
+    @property
+    def display_name(self):
+        return self.original_name or os.path.basename(self.file.name)
+    
     class Meta:
         ordering = ['-uploaded_at']
+        # Duplicate checks look up (patient, sha256)
+        indexes = [
+            models.Index(fields=['patient', 'sha256'], name='medicalrecord_patient_hash_idx'),
+        ]
+
+
+# Appointment statuses that hold the doctor's slot; at most one such appointment per slot
+ACTIVE_APPOINTMENT_STATUSES = ('scheduled', 'confirmed')
+SLOT_TAKEN_MESSAGE = "This time slot is already booked. Please choose another one."
 
 
 class Appointment(models.Model):
@@ -129,6 +267,7 @@ class Appointment(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     )
+    ACTIVE_STATUSES = ACTIVE_APPOINTMENT_STATUSES
     
     patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE, related_name='appointments')
     doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, related_name='appointments')
@@ -144,7 +283,22 @@ class Appointment(models.Model):
     
     class Meta:
         ordering = ['-date', '-time']
-        unique_together = ('patient', 'doctor', 'date', 'time')
+        # Cancelled and finished appointments don't hold their slot, so they can be rebooked
+        constraints = [
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time'],
+                condition=models.Q(status__in=ACTIVE_APPOINTMENT_STATUSES),
+                name='unique_active_doctor_slot',
+                violation_error_message=SLOT_TAKEN_MESSAGE,
+            ),
+        ]
+        # Day schedules and upcoming lists filter on (doctor|patient, date, status);
+        # the doctor's patient list looks up each patient's visits with the doctor
+        indexes = [
+            models.Index(fields=['doctor', 'date', 'status'], name='appointment_doctor_day_idx'),
+            models.Index(fields=['patient', 'date', 'status'], name='appointment_patient_day_idx'),
+            models.Index(fields=['patient', 'doctor', 'date'], name='appointment_patient_doctor_idx'),
+        ]
 
 
 class Checkup(models.Model):
@@ -188,6 +342,11 @@ class Checkup(models.Model):
     
     def __str__(self):
         return f"Checkup - {self.patient.user.first_name} ({self.created_at.date()})"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'doctor', '-created_at'], name='checkup_patient_doctor_idx'),
+        ]
 
 
 class Prescription(models.Model):
@@ -204,8 +363,80 @@ class Prescription(models.Model):
     
     def __str__(self):
         return f"{self.medication_name} for {self.patient.user.first_name}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', '-created_at'], name='prescription_doctor_idx'),
+        ]
+
+class DoctorDailyStats(models.Model):
+    """
+    Per doctor, per day counters kept up to date by signals (see dashboard.py).
+    Appointment counters are by appointment date and current status; new_patients
+    counts patients whose first appointment with the doctor falls on that day, so
+    summing it over all days gives the doctor's unique patients.
+    """
+    doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    scheduled = models.IntegerField(default=0)
+    confirmed = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    prescriptions = models.IntegerField(default=0)
+    new_patients = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"Stats - Dr. {self.doctor.user.first_name} {self.doctor.user.last_name} ({self.day})"
+    
+    class Meta:
+        ordering = ['-day']
+        unique_together = ('doctor', 'day')
+        verbose_name_plural = 'doctor daily stats'
+
+
+class Conversation(models.Model):
+    """
+    All messages between two users. The pair is stored with the lower user id
+    first so each pair has exactly one conversation.
+    """
+    user_low = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Conversation between {self.user_low} and {self.user_high}"
+    
+    class Meta:
+        unique_together = ('user_low', 'user_high')
+
+
+class ConversationParticipant(models.Model):
+    """
+    One user's side of a conversation: what their inbox lists. last_message_at
+    is copied from the conversation so the inbox is a single (user, last_message_at)
+    index scan; unread_count is kept up to date on send and read.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='participants')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='conversation_memberships')
+    other_user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    unread_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.user} in conversation with {self.other_user}"
+    
+    class Meta:
+        unique_together = ('conversation', 'user')
+        indexes = [
+            models.Index(fields=['user', '-last_message_at', 'id'], name='participant_inbox_idx'),
+        ]
+
 
 class Message(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, null=True, blank=True, related_name='messages')
     sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='sent_messages')
     recipient = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='received_messages')
     subject = models.CharField(max_length=255, blank=True)
@@ -215,6 +446,11 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['conversation', '-created_at', 'id'], name='message_thread_idx'),
+            models.Index(fields=['recipient', '-created_at'], name='message_recipient_idx'),
+            models.Index(fields=['sender', '-created_at'], name='message_sender_idx'),
+        ]
         
     def __str__(self):
         return f"From {self.sender} to {self.recipient} - {self.created_at}"
@@ -245,6 +481,11 @@ class Medication(models.Model):
     def __str__(self):
         return f"{self.medication_name} - {self.patient.user.first_name}"
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'status', '-start_date'], name='medication_patient_status_idx'),
+        ]
+    
 class LabTest(models.Model):
     checkup = models.ForeignKey(Checkup, on_delete=models.CASCADE, related_name='lab_tests')
     test_name = models.CharField(max_length=100)
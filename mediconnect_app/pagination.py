@@ -0,0 +1,146 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are defined by the last row of the previous page rather than an offset:
+the next page is "rows that sort after (date, time, id) of the last one", a
+range condition the database answers from an index, so page 100 costs the same
+as page 1. Orderings must end in a unique column (usually 'id') so every row
+has a distinct position and cursors stay stable while rows are added.
+
+Cursors are opaque URL-safe strings holding the last row's ordering values.
+Ordering fields may follow forward relations ('user__last_name').
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 20
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    payload = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    """Cursor string -> Python values, converted with each ordering field's to_python()."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor('Cursor does not match this ordering')
+    # Ordering columns are never null, and a NULL bound can't be compared against
+    if any(value is None for value in values):
+        raise InvalidCursor('Cursor values may not be null')
+    try:
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except Exception:
+        raise InvalidCursor('Cursor values do not match the ordering fields')
+
+
+def _resolve_field(model, path):
+    """The model field at the end of a 'fk__field' path."""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _row_value(row, path, field):
+    for relation in path.split('__')[:-1]:
+        row = getattr(row, relation)
+    return getattr(row, field.attname)
+
+
+class KeysetPage:
+    def __init__(self, object_list, cursor, next_cursor, cursor_param):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.cursor_param = cursor_param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return self.cursor is None
+
+
+class KeysetPaginator:
+    """
+    Page a queryset on `ordering`, e.g. ('-date', '-time', 'id'). Directions may
+    be mixed; the last field must be unique. Related orderings should be
+    select_related() so reading the cursor values costs no queries.
+    """
+
+    def __init__(self, queryset, ordering, per_page=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.fields = [_resolve_field(queryset.model, name) for name, _descending in self.ordering]
+        self.per_page = per_page
+
+    def _after(self, values):
+        # (a, b, c) > (x, y, z) in sort order, spelled out so mixed directions work:
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        conditions = []
+        for i, ((name, descending), value) in enumerate(zip(self.ordering, values)):
+            equal = {prior: prior_value for (prior, _d), prior_value in zip(self.ordering[:i], values[:i])}
+            conditions.append(Q(**equal, **{f"{name}__{'lt' if descending else 'gt'}": value}))
+        return reduce(or_, conditions)
+
+    def page(self, cursor=None, cursor_param='cursor'):
+        """Rows after `cursor` (None for the first page). Raises InvalidCursor."""
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self._after(decode_cursor(cursor, self.fields)))
+
+        # One extra row says whether there is a next page, without a COUNT
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            last = rows[-1]
+            next_cursor = encode_cursor([
+                _row_value(last, name, field) for (name, _descending), field in zip(self.ordering, self.fields)
+            ])
+        return KeysetPage(rows, cursor or None, next_cursor, cursor_param)
+
+
+def paginate_keyset(request, queryset, ordering, per_page=DEFAULT_PAGE_SIZE, cursor_param='cursor'):
+    """
+    Page for the cursor in request.GET[cursor_param]; a missing or tampered
+    cursor gives the first page.
+    """
+    paginator = KeysetPaginator(queryset, ordering, per_page)
+    try:
+        page = paginator.page(request.GET.get(cursor_param), cursor_param)
+    except InvalidCursor:
+        page = paginator.page(None, cursor_param)
+
+    # Links keep the other query parameters (filters, the other list's cursor)
+    params = request.GET.copy()
+    params.pop(cursor_param, None)
+    page.first_url = f'?{params.urlencode()}'
+    if page.has_next:
+        params[cursor_param] = page.next_cursor
+        page.next_url = f'?{params.urlencode()}'
+    else:
+        page.next_url = None
+    return page
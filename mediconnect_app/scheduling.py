@@ -0,0 +1,103 @@
+"""
+Doctor schedule helpers: parsing the legacy free-text working hours and
+expanding weekly intervals into per-weekday slot templates.
+"""
+import re
+from datetime import datetime, time, timedelta
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+# Hours used when a doctor has no schedule or the text can't be parsed
+DEFAULT_WORKING_INTERVALS = [(time(9, 0), time(17, 0))]
+DEFAULT_SLOT_MINUTES = 30
+
+_TIME_RANGE_RE = re.compile(
+    r'(\d{1,2})(?:[:.](\d{2}))?\s*([ap]\.?m\.?)?\s*(?:-|–|to)\s*(\d{1,2})(?:[:.](\d{2}))?\s*([ap]\.?m\.?)?',
+    re.IGNORECASE
+)
+_DAY_RANGE_RE = re.compile(
+    r'\b(mon|tue|wed|thu|fri|sat|sun)[a-z]*\.?(?:\s*(?:-|–|to)\s*(mon|tue|wed|thu|fri|sat|sun)[a-z]*\.?)?',
+    re.IGNORECASE
+)
+
+
+def _to_time(hour, minute, meridiem):
+    hour = int(hour)
+    minute = int(minute or 0)
+    if meridiem:
+        meridiem = meridiem[0].lower()
+        if meridiem == 'p' and hour < 12:
+            hour += 12
+        elif meridiem == 'a' and hour == 12:
+            hour = 0
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"Invalid time {hour}:{minute:02d}")
+    return time(hour, minute)
+
+
+def parse_working_hours(text):
+    """
+    Parse free-text hours such as "9:00 AM - 5:00 PM", "09:00-13:00, 14:00-18:00"
+    or "Mon-Fri 9am-5pm" into a list of (weekday, start_time, end_time) tuples,
+    weekday 0 being Monday. Text without days applies to every day, matching how
+    availability behaved before schedules existed. Returns [] if nothing parses.
+    """
+    text = text or ''
+    weekdays = set()
+    for first, last in _DAY_RANGE_RE.findall(text):
+        start = WEEKDAYS.index(first.lower())
+        end = WEEKDAYS.index(last.lower()) if last else start
+        day = start
+        while True:
+            weekdays.add(day)
+            if day == end:
+                break
+            day = (day + 1) % 7
+    if not weekdays:
+        weekdays = set(range(7))
+
+    intervals = []
+    for start_h, start_m, start_ampm, end_h, end_m, end_ampm in _TIME_RANGE_RE.findall(text):
+        # "9-5" without AM/PM: an end before the start is read as PM
+        try:
+            start = _to_time(start_h, start_m, start_ampm)
+            end = _to_time(end_h, end_m, end_ampm)
+        except ValueError:
+            continue
+        if end <= start and not end_ampm and end.hour < 12:
+            end = time(end.hour + 12, end.minute)
+        if end > start:
+            intervals.append((start, end))
+
+    return [(day, start, end) for day in sorted(weekdays) for start, end in intervals]
+
+
+def build_slot_templates(intervals, slot_minutes=DEFAULT_SLOT_MINUTES):
+    """
+    Expand (weekday, start, end, is_break) intervals into {weekday: ['HH:MM', ...]}.
+    A slot is offered when it fits entirely inside a working interval and does
+    not overlap any break on that weekday.
+    """
+    step = timedelta(minutes=slot_minutes)
+    day = datetime(2000, 1, 3)  # any Monday; only the time part matters
+
+    templates = {}
+    for weekday in range(7):
+        working = [(s, e) for d, s, e, is_break in intervals if d == weekday and not is_break]
+        breaks = [(s, e) for d, s, e, is_break in intervals if d == weekday and is_break]
+        slots = set()
+        for start, end in working:
+            current = datetime.combine(day, start)
+            finish = datetime.combine(day, end)
+            while current + step <= finish:
+                slot_start, slot_end = current.time(), (current + step).time()
+                if not any(slot_start < b_end and b_start < slot_end for b_start, b_end in breaks):
+                    slots.add(slot_start)
+                current += step
+        templates[str(weekday)] = [slot.strftime('%H:%M') for slot in sorted(slots)]
+    return templates
+
+
+DEFAULT_SLOT_TEMPLATES = build_slot_templates(
+    [(weekday, start, end, False) for weekday in range(7) for start, end in DEFAULT_WORKING_INTERVALS]
+)
@@ -0,0 +1,198 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .availability import ACTIVE_STATUSES, invalidate_availability
+from .charts import invalidate_patient_chart
+from .dashboard import (
+    invalidate_doctor_stats, note_first_visit, record_prescription, record_status_change, settle_first_visit
+)
+from .live import publish_message
+from .messaging import get_or_create_conversation, record_message
+from .models import (
+    Appointment, Checkup, DoctorProfile, DoctorSchedule, LabTest, MedicalForm, MedicalRecord, Message, Prescription,
+    ScheduleInterval
+)
+from .tasks import schedule_checkup_prediction
+from .uploads import release_blob
+
+
+@receiver(post_save, sender=Checkup)
+def predict_checkup_disease(sender, instance, created, **kwargs):
+    # Only fill the field when it's empty; a doctor's own entry wins
+    if not instance.predicted_disease and instance.symptoms:
+        schedule_checkup_prediction(instance.pk)
+
+
+@receiver(post_save, sender=DoctorProfile)
+def create_doctor_schedule(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not DoctorSchedule.objects.filter(doctor=instance).exists():
+        DoctorSchedule.create_from_working_hours(instance)
+
+
+@receiver(post_save, sender=DoctorSchedule)
+def rebuild_schedule_on_save(sender, instance, raw=False, **kwargs):
+    # rebuild_slot_templates writes with update(), so this doesn't recurse
+    if not raw:
+        instance.rebuild_slot_templates()
+
+
+@receiver(post_save, sender=ScheduleInterval)
+@receiver(post_delete, sender=ScheduleInterval)
+def rebuild_schedule_on_interval_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule = DoctorSchedule.objects.filter(pk=instance.schedule_id).first()
+    if schedule:
+        schedule.rebuild_slot_templates()
+
+
+APPOINTMENT_STATE_FIELDS = ('doctor_id', 'date', 'time', 'status', 'patient_id')
+
+
+def _appointment_state(appointment):
+    # Read straight from __dict__ so deferred fields never trigger a query
+    values = appointment.__dict__
+    return tuple(values.get(field) for field in APPOINTMENT_STATE_FIELDS)
+
+
+def _merged_state(appointment, old):
+    new = _appointment_state(appointment)
+    if old is None:
+        return new
+    # Fields that were never loaded weren't changed either
+    return tuple(o if n is None else n for n, o in zip(new, old))
+
+
+def _pair(state):
+    return state[0], state[4]
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_state(sender, instance, **kwargs):
+    instance._appointment_state = _appointment_state(instance)
+
+
+@receiver(pre_save, sender=Appointment)
+def prepare_appointment_save(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    if None in instance._appointment_state:
+        # Loaded with only()/defer(): fetch what the row held before this save
+        stored = Appointment.objects.filter(pk=instance.pk).values_list(*APPOINTMENT_STATE_FIELDS).first()
+        if stored:
+            instance._appointment_state = stored
+    old = instance._appointment_state
+    new = _merged_state(instance, old)
+    # Only a moved or reassigned appointment can change a first visit
+    if (old[0], old[1], old[4]) != (new[0], new[1], new[4]):
+        for doctor_id, patient_id in {_pair(new), _pair(old)}:
+            note_first_visit(doctor_id, patient_id)
+
+
+@receiver(post_save, sender=Appointment)
+def update_appointment_caches_on_save(sender, instance, created, raw=False, **kwargs):
+    old = None if created else instance._appointment_state
+    new = _merged_state(instance, old)
+    instance._appointment_state = new
+    if old == new or raw:
+        return
+    doctor_id, day, _time, status, patient_id = new
+
+    record_status_change(old and (old[0], old[1], old[3]), (doctor_id, day, status))
+    if created:
+        note_first_visit(doctor_id, patient_id, exclude_pk=instance.pk)
+    for pair in {_pair(new), _pair(old or new)}:
+        settle_first_visit(*pair)
+    for affected in {doctor_id, old[0] if old else None} - {None}:
+        invalidate_doctor_stats(affected)
+
+    # Cached availability only holds active bookings, so only the active side(s) matter
+    if old is not None and old[3] in ACTIVE_STATUSES:
+        invalidate_availability(old[0], old[1])
+    if status in ACTIVE_STATUSES:
+        invalidate_availability(doctor_id, day)
+
+
+@receiver(pre_delete, sender=Appointment)
+def prepare_appointment_delete(sender, instance, **kwargs):
+    doctor_id, _day, _time, _status, patient_id = instance._appointment_state
+    if doctor_id and patient_id:
+        # A cascade sends every pre_delete before deleting anything: keep the first note
+        note_first_visit(doctor_id, patient_id, replace=False)
+
+
+@receiver(post_delete, sender=Appointment)
+def update_appointment_caches_on_delete(sender, instance, **kwargs):
+    doctor_id, day, _time, status, patient_id = instance._appointment_state
+    if None in (doctor_id, day, status, patient_id):
+        return
+    record_status_change((doctor_id, day, status), None)
+    settle_first_visit(doctor_id, patient_id, create=False)
+    invalidate_doctor_stats(doctor_id)
+    if status in ACTIVE_STATUSES:
+        invalidate_availability(doctor_id, day)
+
+
+@receiver(post_save, sender=Prescription)
+def count_prescription(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_prescription(instance, 1)
+    invalidate_doctor_stats(instance.doctor_id)
+
+
+@receiver(post_delete, sender=Prescription)
+def uncount_prescription(sender, instance, **kwargs):
+    record_prescription(instance, -1)
+    invalidate_doctor_stats(instance.doctor_id)
+
+
+@receiver(pre_save, sender=Message)
+def assign_message_conversation(sender, instance, raw=False, **kwargs):
+    if not raw and instance.conversation_id is None:
+        instance.conversation = get_or_create_conversation(instance.sender_id, instance.recipient_id)
+
+
+@receiver(post_save, sender=Message)
+def update_conversation_on_send(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_message(instance)
+        transaction.on_commit(lambda: publish_message(instance))
+
+
+@receiver(post_save, sender=MedicalForm)
+@receiver(post_delete, sender=MedicalForm)
+@receiver(post_save, sender=MedicalRecord)
+@receiver(post_delete, sender=MedicalRecord)
+@receiver(post_save, sender=Checkup)
+@receiver(post_delete, sender=Checkup)
+@receiver(post_save, sender=Prescription)
+@receiver(post_delete, sender=Prescription)
+def invalidate_chart(sender, instance, **kwargs):
+    invalidate_patient_chart(instance.patient_id)
+
+
+@receiver(post_save, sender=LabTest)
+@receiver(post_delete, sender=LabTest)
+def invalidate_chart_on_lab_test(sender, instance, **kwargs):
+    # During a checkup delete the checkup row may already be gone; its own signal covers the chart
+    patient_id = Checkup.objects.filter(pk=instance.checkup_id).values_list('patient_id', flat=True).first()
+    if patient_id:
+        invalidate_patient_chart(patient_id)
+
+
+@receiver(m2m_changed, sender=MedicalForm.tags.through)
+def invalidate_chart_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_patient_chart(instance.patient_id)
+    elif pk_set:
+        # Changed from the tag's side: pk_set holds medical form ids
+        for patient_id in MedicalForm.objects.filter(pk__in=pk_set).values_list('patient_id', flat=True):
+            invalidate_patient_chart(patient_id)
+
+
+@receiver(post_delete, sender=MedicalRecord)
+def release_medical_record_blob(sender, instance, **kwargs):
+    release_blob(instance.sha256, instance.file.name, instance.patient_id)
@@ -0,0 +1,58 @@
+"""
+Background work that should stay off the request path.
+
+There is no task queue in this project, so jobs run on a small in-process
+thread pool once the surrounding transaction commits. Set
+CHECKUP_PREDICTION_ASYNC = False to run them inline (tests, scripts).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .utils import extract_symptoms, predict_disease, predict_disease_batch
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='checkup-prediction')
+
+
+def predict_diseases_for_texts(texts):
+    """
+    Top predicted disease for each free text symptom description ('' when no
+    known symptom is mentioned). Uses the vectorized batch scorer when the
+    pattern backend is active.
+    """
+    symptom_sets = [extract_symptoms(text or '') for text in texts]
+    if getattr(settings, 'DISEASE_PREDICTION_BACKEND', 'patterns') == 'patterns':
+        results = predict_disease_batch(symptom_sets, top_k=1)
+    else:
+        results = [predict_disease(symptoms) for symptoms in symptom_sets]
+    return [row[0]['disease'].strip() if row else '' for row in results]
+
+
+def populate_checkup_prediction(checkup_id):
+    """Fill Checkup.predicted_disease from its symptoms text, unless a doctor already set it."""
+    from .models import Checkup
+
+    try:
+        symptoms = Checkup.objects.filter(pk=checkup_id).values_list('symptoms', flat=True).first()
+        if symptoms is None:
+            return
+        predicted = predict_diseases_for_texts([symptoms])[0]
+        if predicted:
+            # update() skips post_save, so this can't re-trigger itself
+            Checkup.objects.filter(pk=checkup_id, predicted_disease='').update(predicted_disease=predicted)
+    except Exception:
+        logger.exception("Failed to predict disease for checkup %s", checkup_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_checkup_prediction(checkup_id):
+    """Queue populate_checkup_prediction to run after the current transaction commits."""
+    if getattr(settings, 'CHECKUP_PREDICTION_ASYNC', True):
+        transaction.on_commit(lambda: _executor.submit(populate_checkup_prediction, checkup_id))
+    else:
+        transaction.on_commit(lambda: populate_checkup_prediction(checkup_id))
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from . import availability
+from .booking import SlotTaken, book_slot
+from .cohorts import CohortSpecError, compile_cohort
+from .models import Appointment, CustomUser, DoctorProfile, MedicalRecord, PatientProfile
+from .uploads import blob_name, store_medical_record
+
+
+def make_doctor(email='doctor@example.com'):
+    user = CustomUser.objects.create_user(
+        email=email, password='Passw0rd', first_name='Greg', last_name='House', role='doctor'
+    )
+    return DoctorProfile.objects.create(
+        user=user, phone='12345678', specialization='Cardiology', years_of_experience=5,
+        license_number=email, clinic_name='Clinic', clinic_address='1 Main Street'
+    )
+
+
+def make_patient(email='patient@example.com'):
+    user = CustomUser.objects.create_user(
+        email=email, password='Passw0rd', first_name='Pat', last_name='Smith', role='patient'
+    )
+    return PatientProfile.objects.create(
+        user=user, phone='12345678', date_of_birth=date(1990, 5, 1), gender='M', city='Paris', country='France'
+    )
+
+
+class AvailabilityCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        # A Monday, so the default weekly template has slots
+        self.day = date.today() + timedelta(days=7 - date.today().weekday())
+
+    def book(self, slot=time(9, 0), status='scheduled'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=self.day, time=slot, reason='Checkup', status=status
+            )
+
+    def booked(self):
+        return availability.get_booked_times(self.doctor.pk, [self.day])[self.day]
+
+    def test_booking_and_cancelling_update_cached_slots(self):
+        self.assertEqual(self.booked(), set())
+
+        appointment = self.book()
+        self.assertEqual(self.booked(), {'09:00'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.status = 'cancelled'
+            appointment.save()
+        self.assertEqual(self.booked(), set())
+
+    def test_reader_caching_after_a_booking_commits_does_not_leave_stale_slots(self):
+        # The reader loads the day's rows, then a booking commits (and its
+        # invalidation runs) before the reader stores what it loaded
+        store = cache.set_many
+
+        def book_then_store(*args, **kwargs):
+            self.book()
+            return store(*args, **kwargs)
+
+        with mock.patch.object(availability.cache, 'set_many', side_effect=book_then_store):
+            self.assertEqual(self.booked(), set())
+
+        self.assertEqual(self.booked(), {'09:00'})
+
+
+class DoctorDashboardQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_doctor()
+        self.client.force_login(self.doctor.user)
+
+    def add_patients(self, count, start=0):
+        today = date.today()
+        for i in range(start, start + count):
+            patient = make_patient(f'patient{i}@example.com')
+            for days_ago, status in ((30, 'completed'), (0, 'scheduled')):
+                Appointment.objects.create(
+                    patient=patient, doctor=self.doctor, date=today - timedelta(days=days_ago),
+                    time=time(8 + i // 2, 30 * (i % 2)), reason='Checkup', status=status
+                )
+
+    def test_query_count_does_not_grow_with_patients(self):
+        # Session, user, doctor, counters from the daily stats rollup,
+        # today's schedule, recent patients
+        self.add_patients(2)
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('doctor_dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+        # Counters are cached until the next change
+        with self.assertNumQueries(5):
+            self.client.get(reverse('doctor_dashboard'))
+
+        self.add_patients(8, start=2)
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('doctor_dashboard'))
+        self.assertEqual(len(response.context['next_4_appointments']), 4)
+        self.assertEqual(len(response.context['recent_patients']), 5)
+
+
+def next_monday():
+    # The default weekly template has slots on Mondays
+    return date.today() + timedelta(days=7 - date.today().weekday())
+
+
+class BookingTests(TestCase):
+    def test_patient_can_rebook_a_slot_they_cancelled(self):
+        doctor, patient = make_doctor(), make_patient()
+        appointment = book_slot(patient, doctor, next_monday(), time(9, 0))
+        appointment.status = 'cancelled'
+        appointment.save()
+
+        self.client.force_login(patient.user)
+        response = self.client.post(reverse('book_appointment'), {
+            'doctor': doctor.pk, 'date': next_monday().isoformat(), 'time': '09:00', 'reason': 'Checkup',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Appointment.objects.filter(status='scheduled').count(), 1)
+
+    def test_other_integrity_errors_are_not_reported_as_a_taken_slot(self):
+        doctor, patient = make_doctor(), make_patient()
+        book_slot(patient, doctor, next_monday(), time(9, 0), status='cancelled')
+        # reason is NOT NULL; the cancelled row in the same slot must not turn this into SlotTaken
+        with self.assertRaises(IntegrityError):
+            book_slot(make_patient('other@example.com'), doctor, next_monday(), time(9, 0), reason=None)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    threads = 8
+
+    def test_exactly_one_concurrent_booking_of_a_slot_wins(self):
+        doctor = make_doctor()
+        patients = [make_patient(f'patient{i}@example.com') for i in range(self.threads)]
+        barrier = threading.Barrier(self.threads)
+        outcomes, errors = [], []
+
+        def attempt(patient):
+            try:
+                barrier.wait()
+                book_slot(patient, doctor, next_monday(), time(10, 0), reason='Stress test')
+                outcomes.append('booked')
+            except SlotTaken:
+                outcomes.append('taken')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                # Each thread has its own connection
+                connection.close()
+
+        workers = [threading.Thread(target=attempt, args=(patient,)) for patient in patients]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(outcomes), ['booked'] + ['taken'] * (self.threads - 1))
+        self.assertEqual(
+            Appointment.objects.filter(doctor=doctor, status__in=Appointment.ACTIVE_STATUSES).count(), 1
+        )
+
+
+class CohortSpecTests(TestCase):
+    def assertRejected(self, spec):
+        with self.assertRaises(CohortSpecError):
+            list(compile_cohort(spec))
+
+    def test_age_bounds_are_whole_years_up_to_150(self):
+        for age in ({'max': 5000}, {'min': -1}, {'min': True}, {'max': 40.5}):
+            with self.subTest(age=age):
+                self.assertRejected({'age': age})
+        self.assertEqual(list(compile_cohort({'age': {'min': 0, 'max': 150}})), [])
+
+    def test_large_float_against_integer_column_is_rejected(self):
+        self.assertRejected({'latest_checkup': {'heart_rate': {'gt': 1e300}}})
+
+    def test_large_float_in_list_against_integer_column_is_rejected(self):
+        self.assertRejected({'latest_checkup': {'heart_rate': {'in': [1, 1e300]}}})
+
+    def test_integers_beyond_64_bits_are_rejected(self):
+        self.assertRejected({'latest_checkup': {'heart_rate': {'gt': 2 ** 63}}})
+        self.assertRejected({'latest_checkup': {'temperature': {'lt': -2 ** 70}}})
+
+    def test_operands_must_match_the_column_type(self):
+        self.assertRejected({'latest_checkup': {'heart_rate': 'fast'}})
+        self.assertRejected({'latest_checkup': {'heart_rate': True}})
+        self.assertRejected({'latest_checkup': {'temperature': float('nan')}})
+        self.assertRejected({'latest_checkup': {'predicted_disease': 12}})
+
+    def test_valid_numbers_are_accepted(self):
+        spec = {'latest_checkup': {'heart_rate': {'gt': 2 ** 63 - 1}, 'temperature': {'lt': 1e300}}}
+        self.assertEqual(list(compile_cohort(spec)), [])
+
+    def test_api_answers_400_for_out_of_range_operands(self):
+        staff = CustomUser.objects.create_superuser(email='staff@example.com', password='Passw0rd')
+        self.client.force_login(staff)
+        for spec in ({'heart_rate': {'gt': 1e300}}, {'heart_rate': {'in': [1e300]}}):
+            with self.subTest(spec=spec):
+                response = self.client.get(
+                    reverse('cohort_report'), {'spec': json.dumps({'latest_checkup': spec})}
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class MedicalRecordUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.patient = make_patient()
+
+    def test_failed_insert_does_not_leave_the_blob_behind(self):
+        with mock.patch.object(MedicalRecord, 'save', side_effect=IntegrityError('insert failed')):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(IntegrityError):
+                    store_medical_record(self.patient, ContentFile(b'scan', name='scan.pdf'))
+
+        self.assertFalse(default_storage.exists(blob_name(hashlib.sha256(b'scan').hexdigest(), 'scan.pdf')))
+
+    def test_failed_insert_keeps_a_blob_other_records_use(self):
+        record = store_medical_record(make_patient('other@example.com'), ContentFile(b'scan', name='scan.pdf'))
+        with mock.patch.object(MedicalRecord, 'save', side_effect=IntegrityError('insert failed')):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(IntegrityError):
+                    store_medical_record(self.patient, ContentFile(b'scan', name='scan.pdf'))
+
+        self.assertTrue(default_storage.exists(record.file.name))
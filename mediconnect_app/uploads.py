@@ -0,0 +1,158 @@
+"""
+Streamed, content-addressed medical record uploads.
+
+HashingUploadHandler replaces Django's upload handlers on the upload view: it
+writes each incoming chunk to a temporary file and feeds it to SHA-256 as it
+arrives, and drops a file as soon as it passes MEDICAL_RECORD_MAX_FILE_SIZE,
+so no upload is ever held in memory whole or read twice.
+
+store_medical_record() then files the upload under its hash,
+medical_records/sha256/<2 hex>/<hash><ext>. Identical bytes share that one
+blob: a second copy is discarded instead of stored. The record keeps the
+hash, size and original file name. A patient can't upload the same content
+twice, and the sizes of a patient's records may not add up to more than
+MEDICAL_RECORD_PATIENT_QUOTA. Deleting a record removes the blob once no
+record points at it (release_blob(), from the post_delete signal).
+
+Both run with the patient's row locked (select_for_update), so a patient's
+concurrent uploads can't both pass the duplicate and quota checks, and
+deleting one of their records can't remove a blob that an upload of theirs
+has just found on disk and is about to record.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import Sum
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from .models import MedicalRecord, PatientProfile
+
+BLOB_DIR = 'medical_records/sha256'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """The upload breaks a quota or duplicates one of the patient's records; the message is for the user."""
+
+
+def file_too_large_message():
+    return f"Files can be at most {filesizeformat(settings.MEDICAL_RECORD_MAX_FILE_SIZE)}."
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams uploads to temporary files, hashing them on the way. The uploaded
+    file gets a `sha256` attribute; files over the size limit are skipped and
+    their field names listed in request.oversized_uploads.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.MEDICAL_RECORD_MAX_FILE_SIZE:
+            self.request.oversized_uploads = getattr(self.request, 'oversized_uploads', []) + [self.field_name]
+            raise SkipFile()
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
+
+
+def file_sha256(file):
+    """Hex SHA-256 of a file, read in chunks."""
+    hasher = hashlib.sha256()
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+def blob_name(sha256, filename):
+    extension = os.path.splitext(filename)[1].lower()[:10]
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256}{extension}"
+
+
+def save_blob(sha256, file):
+    """Store `file` under its hash unless that blob already exists; returns the storage name."""
+    name = blob_name(sha256, file.name)
+    if not default_storage.exists(name):
+        # A temporary upload is moved into place, not copied
+        saved = default_storage.save(name, file)
+        if saved != name:
+            # Lost a race with an upload of the same bytes: theirs is identical, keep it
+            default_storage.delete(saved)
+    return name
+
+
+def patient_storage_used(patient):
+    return patient.medical_records.aggregate(total=Sum('size', default=0))['total']
+
+
+def _lock_patient(patient_id):
+    PatientProfile.objects.select_for_update().filter(pk=patient_id).exists()
+
+
+def store_medical_record(patient, file, description=''):
+    """Create a MedicalRecord for an uploaded file, or raise UploadRejected."""
+    if file.size > settings.MEDICAL_RECORD_MAX_FILE_SIZE:
+        raise UploadRejected(file_too_large_message())
+    sha256 = getattr(file, 'sha256', None) or file_sha256(file)
+
+    name = None
+    try:
+        with transaction.atomic():
+            # Held until commit: the checks below stay true until the record is inserted
+            _lock_patient(patient.pk)
+            existing = patient.medical_records.filter(sha256=sha256).first()
+            if existing:
+                raise UploadRejected(
+                    f"You already uploaded this file on {timezone.localtime(existing.uploaded_at):%b %d, %Y} as \"{existing.display_name}\"."
+                )
+            used = patient_storage_used(patient)
+            if used + file.size > settings.MEDICAL_RECORD_PATIENT_QUOTA:
+                raise UploadRejected(
+                    f"This file would take your records past your {filesizeformat(settings.MEDICAL_RECORD_PATIENT_QUOTA)} "
+                    f"limit ({filesizeformat(used)} used). Delete some files first."
+                )
+
+            record = MedicalRecord(
+                patient=patient, description=description, sha256=sha256, size=file.size,
+                original_name=os.path.basename(file.name)[:255]
+            )
+            name = save_blob(sha256, file)
+            record.file.name = name
+            record.save()
+    except Exception:
+        if name:
+            # The insert was rolled back; drop the blob unless another record uses it
+            release_blob(sha256, name, patient.pk)
+        raise
+    return record
+
+
+def release_blob(sha256, name, patient_id):
+    """
+    Delete a content-addressed blob once, after commit, no record uses it any
+    more. `patient_id` is the owner of the record that was deleted.
+    """
+    if not sha256 or not name.startswith(BLOB_DIR + '/'):
+        return
+
+    def delete_if_unused():
+        with transaction.atomic():
+            # An upload holding the lock may have just found the blob on disk; look again once it has committed
+            _lock_patient(patient_id)
+            if not MedicalRecord.objects.filter(sha256=sha256, file=name).exists():
+                default_storage.delete(name)
+
+    transaction.on_commit(delete_if_unused)
@@ -25,6 +25,7 @@ urlpatterns = [
     
     # Messaging
     path('inbox/', views.inbox, name='inbox'),
+    path('inbox/<int:conversation_id>/', views.conversation_detail, name='conversation_detail'),
     path('message/new/', views.send_message, name='send_message'),
 
     # Appointments
@@ -57,5 +58,12 @@ urlpatterns = [
     path('chatbot/', views.chatbot, name='chatbot'),
     
     # API endpoints
+    path('api/doctors/search/', views.search_doctors, name='search_doctors'),
     path('api/doctor/<int:doctor_id>/availability/', views.get_doctor_availability, name='doctor_availability'),
+    path('api/doctor/<int:doctor_id>/availability/range/', views.get_doctor_availability_range, name='doctor_availability_range'),
+    path('api/symptoms/predict/', views.predict_symptoms, name='predict_symptoms'),
+    path('api/prediction-cache/stats/', views.prediction_cache_stats, name='prediction_cache_stats'),
+    path('api/reports/doctor-stats/', views.doctor_stats_report, name='doctor_stats_report'),
+    path('api/reports/cohort/', views.cohort_report, name='cohort_report'),
+    path('api/messages/stream/', views.message_stream, name='message_stream'),
 ]
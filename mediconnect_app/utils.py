@@ -1,3 +1,43 @@
+import heapq
+import re
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Symptoms offered by the symptom checker (the columns of the bundled Testing dataset)
+SYMPTOMS = [
+    'itching', 'skin_rash', 'nodal_skin_eruptions', 'continuous_sneezing', 'shivering', 'chills',
+    'joint_pain', 'stomach_pain', 'acidity', 'ulcers_on_tongue', 'muscle_wasting', 'vomiting',
+    'burning_micturition', 'spotting_ urination', 'fatigue', 'weight_gain', 'anxiety',
+    'cold_hands_and_feets', 'mood_swings', 'weight_loss', 'restlessness', 'lethargy',
+    'patches_in_throat', 'irregular_sugar_level', 'cough', 'high_fever', 'sunken_eyes',
+    'breathlessness', 'sweating', 'dehydration', 'indigestion', 'headache', 'yellowish_skin',
+    'dark_urine', 'nausea', 'loss_of_appetite', 'pain_behind_the_eyes', 'back_pain', 'constipation',
+    'abdominal_pain', 'diarrhoea', 'mild_fever', 'yellow_urine', 'yellowing_of_eyes',
+    'acute_liver_failure', 'fluid_overload', 'swelling_of_stomach', 'swelled_lymph_nodes',
+    'malaise', 'blurred_and_distorted_vision', 'phlegm', 'throat_irritation', 'redness_of_eyes',
+    'sinus_pressure', 'runny_nose', 'congestion', 'chest_pain', 'weakness_in_limbs',
+    'fast_heart_rate', 'pain_during_bowel_movements', 'pain_in_anal_region', 'bloody_stool',
+    'irritation_in_anus', 'neck_pain', 'dizziness', 'cramps', 'bruising', 'obesity', 'swollen_legs',
+    'swollen_blood_vessels', 'puffy_face_and_eyes', 'enlarged_thyroid', 'brittle_nails',
+    'swollen_extremeties', 'excessive_hunger', 'extra_marital_contacts', 'drying_and_tingling_lips',
+    'slurred_speech', 'knee_pain', 'hip_joint_pain', 'muscle_weakness', 'stiff_neck',
+    'swelling_joints', 'movement_stiffness', 'spinning_movements', 'loss_of_balance',
+    'unsteadiness', 'weakness_of_one_body_side', 'loss_of_smell', 'bladder_discomfort',
+    'foul_smell_of urine', 'continuous_feel_of_urine', 'passage_of_gases', 'internal_itching',
+    'toxic_look_(typhos)', 'depression', 'irritability', 'muscle_pain', 'altered_sensorium',
+    'red_spots_over_body', 'belly_pain', 'abnormal_menstruation', 'dischromic _patches',
+    'watering_from_eyes', 'increased_appetite', 'polyuria', 'family_history', 'mucoid_sputum',
+    'rusty_sputum', 'lack_of_concentration', 'visual_disturbances', 'receiving_blood_transfusion',
+    'receiving_unsterile_injections', 'coma', 'stomach_bleeding', 'distention_of_abdomen',
+    'history_of_alcohol_consumption', 'blood_in_sputum', 'prominent_veins_on_calf', 'palpitations',
+    'painful_walking', 'pus_filled_pimples', 'blackheads', 'scurring', 'skin_peeling',
+    'silver_like_dusting', 'small_dents_in_nails', 'inflammatory_nails', 'blister',
+    'red_sore_around_nose', 'yellow_crust_ooze'
+]
 
 # Disease patterns derived from user provided template
 DISEASE_PATTERNS = {
@@ -44,37 +84,405 @@ DISEASE_PATTERNS = {
     'Impetigo': ['skin_rash', 'high_fever', 'blister', 'red_sore_around_nose', 'yellow_crust_ooze']
 }
 
+def compile_disease_patterns(patterns):
+    """
+    Compile a {disease: [symptoms]} mapping into integer bitsets.
+    Returns (diseases, symptom_index, disease_masks):
+    - diseases: list of (name, pattern) in mapping order
+    - symptom_index: symptom -> (bitset of diseases listing it, the symptom's own bit)
+    - disease_masks: per disease, the bitset of its symptoms' bits
+    """
+    diseases = list(patterns.items())
+    symptom_index = {}
+    disease_masks = []
+    for position, (disease, pattern) in enumerate(diseases):
+        disease_bit = 1 << position
+        mask = 0
+        for symptom in pattern:
+            if symptom not in symptom_index:
+                symptom_index[symptom] = (0, 1 << len(symptom_index))
+            diseases_bitset, symptom_bit = symptom_index[symptom]
+            symptom_index[symptom] = (diseases_bitset | disease_bit, symptom_bit)
+            mask |= symptom_bit
+        disease_masks.append(mask)
+    return diseases, symptom_index, disease_masks
+
+
+# Compiled once at import; rebuilt only if DISEASE_PATTERNS is rebound
+_compiled_source = DISEASE_PATTERNS
+_compiled_patterns = compile_disease_patterns(DISEASE_PATTERNS)
+
+
+def _get_compiled_patterns():
+    global _compiled_source, _compiled_patterns
+    if _compiled_source is not DISEASE_PATTERNS:
+        _compiled_patterns = compile_disease_patterns(DISEASE_PATTERNS)
+        _compiled_source = DISEASE_PATTERNS
+    return _compiled_patterns
+
+
+def refresh_disease_patterns():
+    """
+    Recompile after DISEASE_PATTERNS was edited in place. Rebinding the name
+    is picked up automatically; in-place edits need this call. Every derived
+    structure (batch matrix, symptom automaton, prediction cache) follows.
+    """
+    global _compiled_patterns
+    _compiled_patterns = compile_disease_patterns(DISEASE_PATTERNS)
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of predict_disease results for one process.
+    Entries are tied to the compiled DISEASE_PATTERNS (or loaded model) they
+    were computed from and are dropped as soon as that source changes.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._source = None
+        self._lock = threading.Lock()
+    
+    def get(self, key, source):
+        with self._lock:
+            if self._source is not source:
+                self._entries.clear()
+                self._source = source
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, source, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if self._source is not source:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+prediction_cache = PredictionCache(maxsize=getattr(settings, 'PREDICTION_CACHE_SIZE', 1024))
+
+
+def _get_prediction_backend():
+    """
+    Return (source, predict) for settings.DISEASE_PREDICTION_BACKEND. source
+    identifies the loaded patterns or model, so cached results follow it.
+    """
+    backend = getattr(settings, 'DISEASE_PREDICTION_BACKEND', 'patterns')
+    if backend == 'patterns':
+        return _get_compiled_patterns(), predict_disease_uncached
+    if backend == 'naive_bayes':
+        from .disease_model import get_naive_bayes_model
+        model = get_naive_bayes_model()
+        return model, model.predict
+    raise ImproperlyConfigured(f"Unknown DISEASE_PREDICTION_BACKEND '{backend}'")
+
+
 def predict_disease(symptoms_list):
     """
     Predict disease based on list of symptoms.
     Returns a list of dictionaries: [{'disease': name, 'probability': score, 'matched_symptoms': []}, ...]
+    Uses settings.DISEASE_PREDICTION_BACKEND; results are memoized in prediction_cache.
     """
     if not symptoms_list:
         return []
     
+    # The list length is part of the key because the adjustment factor counts
+    # every submitted symptom, including repeats and unknown ones
+    key = (frozenset(symptoms_list), len(symptoms_list))
+    source, predict = _get_prediction_backend()
+    predictions = prediction_cache.get(key, source)
+    if predictions is None:
+        predictions = predict(symptoms_list)
+        prediction_cache.put(key, source, predictions)
+    
+    # Callers get their own copies so the cached entry can't be mutated
+    return [dict(p, matched_symptoms=list(p['matched_symptoms'])) for p in predictions]
+
+
+def predict_disease_uncached(symptoms_list):
+    """Compute predict_disease results directly from the compiled patterns."""
+    if not symptoms_list:
+        return []
+    
+    diseases, symptom_index, disease_masks = _get_compiled_patterns()
+    selected = set(symptoms_list)
+    selected_count = len(symptoms_list)
+    
+    # Union of the bitsets: only diseases sharing at least one symptom are scored
+    candidates = 0
+    selected_mask = 0
+    for symptom in selected:
+        entry = symptom_index.get(symptom)
+        if entry:
+            candidates |= entry[0]
+            selected_mask |= entry[1]
+    
+    scored = []
+    
+    while candidates:
+        lowest = candidates & -candidates
+        candidates ^= lowest
+        position = lowest.bit_length() - 1
+        
+        match_count = (disease_masks[position] & selected_mask).bit_count()
+        pattern_length = len(diseases[position][1])
+        
+        # Base probability
+        base_prob = (match_count / pattern_length) * 100
+        
+        # Adjustment factor (penalize if too many symptoms selected that are not in pattern)
+        # This is a simple heuristic to mimic the user's JS logic
+        adjustment = min(1, pattern_length / (selected_count + 1))
+        final_prob = min(95, base_prob * (1 + adjustment * 0.2))
+        
+        scored.append((-round(final_prob), position))
+    
+    # Highest probability first; ties keep DISEASE_PATTERNS order
     predictions = []
+    for neg_prob, position in heapq.nsmallest(5, scored):
+        disease, pattern = diseases[position]
+        predictions.append({
+            'disease': disease,
+            'probability': -neg_prob,
+            'matched_symptoms': [s for s in pattern if s in selected],
+            'total_pattern_symptoms': len(pattern)
+        })
+    return predictions
+
+
+# Vectorized batch scoring
+_pattern_matrix = None
+
+
+def _get_pattern_matrix():
+    """
+    Return (compiled, matrix, lengths) where matrix is a disease x symptom
+    0/1 array whose columns follow get_symptom_vocabulary().
+    """
+    global _pattern_matrix
+    compiled = _get_compiled_patterns()
+    if _pattern_matrix is None or _pattern_matrix[0] is not compiled:
+        diseases, symptom_index, _ = compiled
+        matrix = np.zeros((len(diseases), len(symptom_index)), dtype=np.float32)
+        for row, (_, pattern) in enumerate(diseases):
+            for symptom in pattern:
+                matrix[row, symptom_index[symptom][1].bit_length() - 1] = 1
+        lengths = np.array([len(pattern) for _, pattern in diseases], dtype=np.float64)
+        _pattern_matrix = (compiled, matrix, lengths)
+    return _pattern_matrix
+
+
+def get_symptom_vocabulary():
+    """Symptom names in the column order used by the batch scoring matrix."""
+    _, symptom_index, _ = _get_compiled_patterns()
+    return list(symptom_index)
+
+
+def symptoms_to_matrix(symptom_sets):
+    """
+    Convert a sequence of symptom lists into (matrix, selected_counts).
+    matrix is an N x S multi-hot array over get_symptom_vocabulary(); selected_counts
+    holds len() of each original list, so unknown symptoms still count towards the
+    adjustment exactly as they do in predict_disease.
+    """
+    _, symptom_index, _ = _get_compiled_patterns()
+    matrix = np.zeros((len(symptom_sets), len(symptom_index)), dtype=np.float32)
+    selected_counts = np.empty(len(symptom_sets), dtype=np.float64)
+    for row, symptoms_list in enumerate(symptom_sets):
+        selected_counts[row] = len(symptoms_list)
+        for symptom in symptoms_list:
+            entry = symptom_index.get(symptom)
+            if entry:
+                matrix[row, entry[1].bit_length() - 1] = 1
+    return matrix, selected_counts
+
+
+def score_symptom_matrix(matrix, selected_counts=None, top_k=5):
+    """
+    Score an N x S multi-hot symptom matrix in one matrix product.
+    Returns (disease_indices, probabilities), both N x top_k, using the same
+    formula as predict_disease. Rows with fewer than top_k matching diseases
+    are padded with index -1 and probability 0.
+    """
+    _, pattern_matrix, lengths = _get_pattern_matrix()
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if selected_counts is None:
+        selected_counts = matrix.sum(axis=1, dtype=np.float64)
+    selected_counts = np.asarray(selected_counts, dtype=np.float64)
+    
+    match_counts = (matrix @ pattern_matrix.T).astype(np.float64)
     
-    for disease, pattern in DISEASE_PATTERNS.items():
-        matched = [s for s in pattern if s in symptoms_list]
-        match_count = len(matched)
-        pattern_length = len(pattern)
+    # Same operation order as predict_disease so the floats (and rounding) agree
+    base_prob = (match_counts / lengths) * 100
+    adjustment = np.minimum(1, lengths / (selected_counts[:, None] + 1))
+    final_prob = np.minimum(95, base_prob * (1 + adjustment * 0.2))
+    scores = np.where(match_counts > 0, np.round(final_prob), -1)
+    
+    # Stable sort keeps DISEASE_PATTERNS order for ties, like predict_disease
+    top_k = min(top_k, scores.shape[1])
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :top_k]
+    top_scores = np.take_along_axis(scores, order, axis=1)
+    disease_indices = np.where(top_scores >= 0, order, -1)
+    probabilities = np.maximum(top_scores, 0).astype(np.int64)
+    return disease_indices, probabilities
+
+
+def predict_disease_batch(symptom_sets, top_k=5, chunk_size=10000):
+    """
+    Predict diseases for many symptom lists at once.
+    Returns one predict_disease-style list per input row. Input is processed in
+    chunks of chunk_size rows to keep memory flat on large batches.
+    """
+    compiled = _get_compiled_patterns()
+    diseases = compiled[0]
+    results = []
+    chunk = []
+    
+    def flush():
+        matrix, selected_counts = symptoms_to_matrix(chunk)
+        disease_indices, probabilities = score_symptom_matrix(matrix, selected_counts, top_k)
+        for symptoms_list, indices, probs in zip(chunk, disease_indices.tolist(), probabilities.tolist()):
+            selected = set(symptoms_list)
+            row = []
+            for index, probability in zip(indices, probs):
+                if index < 0:
+                    break
+                disease, pattern = diseases[index]
+                row.append({
+                    'disease': disease,
+                    'probability': probability,
+                    'matched_symptoms': [s for s in pattern if s in selected],
+                    'total_pattern_symptoms': len(pattern)
+                })
+            results.append(row)
+        chunk.clear()
+    
+    for symptoms_list in symptom_sets:
+        chunk.append(symptoms_list)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return results
+
+
+# Symptom extraction from free text
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize_symptom_text(text):
+    """Lower-case words of text; underscores and punctuation act as separators."""
+    return _WORD_RE.findall(text.lower())
+
+
+class SymptomAutomaton:
+    """
+    Aho-Corasick automaton over symptom phrases, using words as the alphabet.
+    Matching runs over the tokenized message in a single pass, so every hit is
+    aligned to whole words ("chills" never matches inside another word).
+    """
+
+    def __init__(self, symptoms):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.vocabulary = set()
         
-        if match_count > 0:
-            # Base probability
-            base_prob = (match_count / pattern_length) * 100
-            
-            # Adjustment factor (penalize if too many symptoms selected that are not in pattern)
-            # This is a simple heuristic to mimic the user's JS logic
-            adjustment = min(1, pattern_length / (len(symptoms_list) + 1))
-            final_prob = min(95, base_prob * (1 + adjustment * 0.2))
-            
-            predictions.append({
-                'disease': disease,
-                'probability': round(final_prob),
-                'matched_symptoms': matched,
-                'total_pattern_symptoms': pattern_length
-            })
-            
-    # Sort by probability desc
-    predictions.sort(key=lambda x: x['probability'], reverse=True)
-    return predictions[:5]
+        for symptom in symptoms:
+            node = 0
+            for word in tokenize_symptom_text(symptom):
+                self.vocabulary.add(word)
+                child = self.goto[node].get(word)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][word] = child
+                node = child
+            if node and symptom not in self.output[node]:
+                self.output[node].append(symptom)
+        
+        # Breadth-first pass to set failure links and merge outputs of suffixes
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and word not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(word, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+    
+    def find(self, text):
+        """Return the symptoms mentioned in text, in order of appearance, without duplicates."""
+        goto, fail, output, vocabulary = self.goto, self.fail, self.output, self.vocabulary
+        found = []
+        seen = set()
+        node = 0
+        for word in tokenize_symptom_text(text):
+            # A word outside every phrase can only lead back to the root
+            if word not in vocabulary:
+                node = 0
+                continue
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+            for symptom in output[node]:
+                if symptom not in seen:
+                    seen.add(symptom)
+                    found.append(symptom)
+        return found
+
+
+def _build_symptom_automaton(compiled):
+    _, symptom_index, _ = compiled
+    return compiled, SymptomAutomaton(symptom_index)
+
+
+# Built once at startup; rebuilt only if DISEASE_PATTERNS is rebound
+_symptom_automaton = _build_symptom_automaton(_compiled_patterns)
+
+
+def extract_symptoms(message):
+    """
+    Find every known symptom mentioned in a free text message.
+    Both 'skin_rash' and 'skin rash' forms are recognised.
+    """
+    global _symptom_automaton
+    compiled = _get_compiled_patterns()
+    if _symptom_automaton[0] is not compiled:
+        _symptom_automaton = _build_symptom_automaton(compiled)
+    return _symptom_automaton[1].find(message)
@@ -1,21 +1,49 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
-from django.db.models import Q, Count
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.gzip import gzip_page
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Q, Count, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta, date
+import json
+import time
+from asgiref.sync import sync_to_async
 from .models import (
-    CustomUser, DoctorProfile, PatientProfile, MedicalForm, 
-    MedicalRecord, Appointment, Checkup, Prescription, Medication, Message
+    CustomUser, DoctorProfile, PatientProfile, MedicalForm, MedicalTag,
+    MedicalRecord, Appointment, Checkup, Prescription, Medication, Message,
+    ConversationParticipant
 )
 from .forms import (
     LoginForm, DoctorSignUpForm, PatientSignUpForm, MedicalFormForm,
     MedicalRecordForm, AppointmentBookForm, CheckupForm, PrescriptionForm,
     MedicationForm, AppointmentUpdateForm
 )
+from .availability import get_available_slots
+from .booking import SLOT_TAKEN_MESSAGE, SlotTaken, book_slot, save_appointment
+from .charts import load_patient_chart, medical_form_summary
+from .cohorts import CohortSpecError, cohort_patient_ids
+from .dashboard import daily_stats_report, get_doctor_stats
+from .live import live_messages_enabled, stream_events
+from .messaging import mark_conversation_read
+from .pagination import paginate_keyset
+from .patients import AGE_BANDS, doctor_patients
+from .uploads import HashingUploadHandler, UploadRejected, file_too_large_message, store_medical_record
+from .utils import SYMPTOMS, predict_disease, extract_symptoms, prediction_cache
+
+KNOWN_SYMPTOMS = frozenset(SYMPTOMS)
+
+# Keyset pagination orderings; the trailing id makes every position unique
+APPOINTMENT_ORDERING = ('-date', '-time', 'id')
+MESSAGE_ORDERING = ('-created_at', 'id')
+CONVERSATION_ORDERING = ('-last_message_at', 'id')
+PATIENT_LIST_ORDERING = ('user__first_name', 'user__last_name', 'id')
 
 
 # Authentication Views
@@ -139,32 +167,11 @@ def complete_medical_form(request, user_id):
         return redirect('patient_dashboard')
     
     if request.method == 'POST':
-        form = MedicalFormForm(request.POST)
+        form = MedicalFormForm(request.POST, instance=MedicalForm(patient=patient_profile))
         if form.is_valid():
-            medical_form = MedicalForm.objects.create(
-                patient=patient_profile,
-                has_chronic_diseases=form.cleaned_data.get('has_chronic_diseases', False),
-                has_allergies=form.cleaned_data.get('has_allergies', False),
-                has_family_history=form.cleaned_data.get('has_family_history', False),
-            )
-            
-            # Process chronic diseases
-            if form.cleaned_data.get('chronic_disease_choices'):
-                medical_form.chronic_diseases = ', '.join(form.cleaned_data['chronic_disease_choices'])
-            
-            # Process allergies
-            if form.cleaned_data.get('allergies'):
-                medical_form.allergies = form.cleaned_data['allergies']
-            
-            # Process vaccines
-            if form.cleaned_data.get('vaccine_choices'):
-                medical_form.vaccines = ', '.join(form.cleaned_data['vaccine_choices'])
-            
-            # Process family history
-            if form.cleaned_data.get('family_history_choices'):
-                medical_form.family_history = ', '.join(form.cleaned_data['family_history_choices'])
-            
-            medical_form.save()
+            # The form row and its checklist tags land together
+            with transaction.atomic():
+                form.save()
             
             return redirect('patient_dashboard')
     else:
@@ -197,7 +204,6 @@ def patient_dashboard(request):
     patient = get_object_or_404(PatientProfile, user=request.user)
     
     # Get latest checkup
-    latest_checkup = patient.checkups.first()
     latest_checkup = Checkup.objects.filter(patient=patient).order_by('-created_at').first()
     
     # Get upcoming appointments (next 3)
@@ -205,7 +211,7 @@ def patient_dashboard(request):
     upcoming_appointments = patient.appointments.filter(
         date__gte=today,
         status__in=['scheduled', 'confirmed']
-    ).order_by('date', 'time')[:3]
+    ).select_related('doctor__user').order_by('date', 'time')[:3]
     
     # Get active medications count
     active_medications_count = patient.medications.filter(status='active').count()
@@ -226,45 +232,25 @@ def doctor_dashboard(request):
         return redirect('dashboard')
     
     doctor = get_object_or_404(DoctorProfile, user=request.user)
-    
-    # Total unique patients
-    total_patients = doctor.appointments.values('patient').distinct().count()
-    
-    # Today's appointments count
     today = date.today()
-    today_appointments = doctor.appointments.filter(
-        date=today,
-        status__in=['scheduled', 'confirmed']
-    )
-    today_appointments_count = today_appointments.count()
     
-    # Completed vs remaining today
-    completed_today = doctor.appointments.filter(
-        date=today,
-        status='completed'
-    ).count()
-    remaining_today = today_appointments_count - completed_today
-    
-    # Pending prescriptions today
-    pending_prescriptions = doctor.prescriptions.filter(
-        created_at__date=today
-    ).count()
+    # Counters: one aggregate over the DoctorDailyStats rollup, cached briefly
+    stats = get_doctor_stats(doctor, today)
     
     # Today's schedule (next 4 appointments)
-    next_4_appointments = today_appointments.order_by('time')[:4]
+    next_4_appointments = doctor.appointments.filter(
+        date=today,
+        status__in=['scheduled', 'confirmed']
+    ).select_related('patient__user').order_by('time')[:4]
     
     # Recent patients
     recent_patients = PatientProfile.objects.filter(
         appointments__doctor=doctor
-    ).distinct().order_by('-appointments__created_at')[:5]
+    ).select_related('user').distinct().order_by('-appointments__created_at')[:5]
     
     context = {
         'doctor': doctor,
-        'total_patients': total_patients,
-        'today_appointments_count': today_appointments_count,
-        'completed_today': completed_today,
-        'remaining_today': remaining_today,
-        'pending_prescriptions': pending_prescriptions,
+        **stats,
         'next_4_appointments': next_4_appointments,
         'recent_patients': recent_patients,
     }
@@ -278,25 +264,14 @@ def patient_profile(request):
     if request.user.role != 'patient':
         return redirect('dashboard')
     
-    patient = get_object_or_404(PatientProfile, user=request.user)
-    medical_form = getattr(patient, 'medical_form', None)
-    
-    # Process medical form data for template
-    medical_data = None
-    if medical_form:
-        medical_data = {
-            'has_chronic_diseases': medical_form.has_chronic_diseases,
-            'chronic_diseases': [d.strip() for d in medical_form.chronic_diseases.split(',') if d.strip()] if medical_form.chronic_diseases else [],
-            'has_allergies': medical_form.has_allergies,
-            'allergies': medical_form.allergies,
-            'vaccines': [v.strip() for v in medical_form.vaccines.split(',') if v.strip()] if medical_form.vaccines else [],
-            'has_family_history': medical_form.has_family_history,
-            'family_history': [f.strip() for f in medical_form.family_history.split(',') if f.strip()] if medical_form.family_history else [],
-        }
+    patient = get_object_or_404(
+        PatientProfile.objects.select_related('user', 'medical_form').prefetch_related('medical_form__tags'),
+        user=request.user
+    )
     
     context = {
         'patient': patient,
-        'medical_form': medical_data,
+        'medical_form': medical_form_summary(getattr(patient, 'medical_form', None)),
     }
     
     return render(request, 'patient/profile.html', context)
@@ -307,7 +282,7 @@ def doctor_profile(request):
     if request.user.role != 'doctor':
         return redirect('dashboard')
     
-    doctor = get_object_or_404(DoctorProfile, user=request.user)
+    doctor = get_object_or_404(DoctorProfile.objects.select_related('user'), user=request.user)
     
     context = {
         'doctor': doctor,
@@ -322,7 +297,7 @@ def symptom_checker(request):
     if request.user.role != 'patient':
         messages.error(request, "Only patients can access the Symptom Checker.")
         return redirect('dashboard')
-    return render(request, 'patient/checkup_checker.html')
+    return render(request, 'patient/checkup_checker.html', {'symptoms': SYMPTOMS})
 
 @login_required
 def book_appointment(request):
@@ -334,10 +309,19 @@ def book_appointment(request):
     if request.method == 'POST':
         form = AppointmentBookForm(request.POST)
         if form.is_valid():
-            appointment = form.save(commit=False)
-            appointment.patient = patient
-            appointment.save()
-            return redirect('appointments_list')
+            try:
+                book_slot(
+                    patient, form.cleaned_data['doctor'], form.cleaned_data['date'],
+                    form.cleaned_data['time'], form.cleaned_data['reason']
+                )
+                return redirect('appointments_list')
+            except SlotTaken:
+                # Lost a race with another booking after the form validated
+                form.add_error(None, SLOT_TAKEN_MESSAGE)
+                return render(request, 'appointments/book_appointment.html', {
+                    'form': form,
+                    'patient': patient
+                }, status=409)
     else:
         form = AppointmentBookForm()
     
@@ -351,7 +335,9 @@ def book_appointment(request):
 def appointments_list(request):
     if request.user.role == 'patient':
         patient = get_object_or_404(PatientProfile, user=request.user)
-        appointments = patient.appointments.all().order_by('-date', '-time')
+        appointments = paginate_keyset(
+            request, patient.appointments.select_related('doctor__user'), APPOINTMENT_ORDERING
+        )
         return render(request, 'appointments/appointments_list.html', {
             'appointments': appointments
         })
@@ -367,16 +353,22 @@ def doctor_appointments_list(request):
         return redirect('dashboard')
     
     doctor = get_object_or_404(DoctorProfile, user=request.user)
-    appointments = doctor.appointments.all().order_by('-date', '-time')
+    appointments = doctor.appointments.select_related('patient__user')
     
     # Filter options
     status_filter = request.GET.get('status')
     if status_filter:
         appointments = appointments.filter(status=status_filter)
     
+    # Per-status totals for the filter tabs in one grouped query
+    status_counts = dict(doctor.appointments.values_list('status').annotate(n=Count('id')).order_by())
+    
     context = {
-        'appointments': appointments,
-        'status_choices': ['scheduled', 'confirmed', 'completed', 'cancelled'],
+        'appointments': paginate_keyset(request, appointments, APPOINTMENT_ORDERING),
+        'status_choices': [
+            (status, status_counts.get(status, 0))
+            for status in ['scheduled', 'confirmed', 'completed', 'cancelled']
+        ],
         'selected_status': status_filter,
     }
     
@@ -385,14 +377,16 @@ def doctor_appointments_list(request):
 
 @login_required
 def appointment_detail(request, appointment_id):
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+    appointment = get_object_or_404(
+        Appointment.objects.select_related('patient__user', 'doctor__user'), id=appointment_id
+    )
     
     # Check authorization
     if request.user.role == 'patient':
-        if appointment.patient.user != request.user:
+        if appointment.patient.user_id != request.user.id:
             return redirect('dashboard')
     elif request.user.role == 'doctor':
-        if appointment.doctor.user != request.user:
+        if appointment.doctor.user_id != request.user.id:
             return redirect('dashboard')
     else:
         return redirect('dashboard')
@@ -400,8 +394,15 @@ def appointment_detail(request, appointment_id):
     if request.method == 'POST' and request.user.role == 'doctor':
         form = AppointmentUpdateForm(request.POST, instance=appointment)
         if form.is_valid():
-            form.save()
-            return redirect('appointment_detail', appointment_id=appointment.id)
+            try:
+                save_appointment(appointment)
+                return redirect('appointment_detail', appointment_id=appointment.id)
+            except SlotTaken:
+                # The slot was booked after the form validated
+                form.add_error('status', SLOT_TAKEN_MESSAGE)
+        if form.errors:
+            # Show the appointment as stored, not as submitted
+            appointment.refresh_from_db(fields=['status', 'notes'])
     else:
         form = AppointmentUpdateForm(instance=appointment) if request.user.role == 'doctor' else None
     
@@ -415,25 +416,45 @@ def appointment_detail(request, appointment_id):
 
 # Medical Records
 @login_required
+@csrf_exempt
 def medical_records_list(request):
+    # Uploads stream to disk through HashingUploadHandler, which must be installed
+    # before anything reads request.POST; the CSRF check runs just after, below
+    request.upload_handlers = [HashingUploadHandler(request)]
+    return _medical_records_list(request)
+
+
+@csrf_protect
+def _medical_records_list(request):
     if request.user.role != 'patient':
         return redirect('dashboard')
     
     patient = get_object_or_404(PatientProfile, user=request.user)
-    medical_records = patient.medical_records.all()
+    medical_records = paginate_keyset(request, patient.medical_records.all(), ('-uploaded_at', 'id'))
     
     if request.method == 'POST':
         form = MedicalRecordForm(request.POST, request.FILES)
         if form.is_valid():
-            record = form.save(commit=False)
-            record.patient = patient
-            record.save()
-            return redirect('medical_records_list')
+            try:
+                store_medical_record(patient, form.cleaned_data['file'], form.cleaned_data['description'])
+            except UploadRejected as error:
+                form.add_error('file', str(error))
+            else:
+                return redirect('medical_records_list')
+        elif 'file' in getattr(request, 'oversized_uploads', ()):
+            # The handler dropped the file mid-stream, so the form only saw it missing
+            form.errors['file'] = form.error_class([file_too_large_message()])
     else:
         form = MedicalRecordForm()
     
+    totals = patient.medical_records.aggregate(count=Count('id'), used=Sum('size', default=0))
+    
     context = {
         'medical_records': medical_records,
+        'medical_records_count': totals['count'],
+        'storage_used': totals['used'],
+        'storage_quota': settings.MEDICAL_RECORD_PATIENT_QUOTA,
+        'max_file_size': settings.MEDICAL_RECORD_MAX_FILE_SIZE,
         'form': form,
     }
     
@@ -445,9 +466,9 @@ def delete_medical_record(request, record_id):
     if request.user.role != 'patient':
         return redirect('dashboard')
     
-    record = get_object_or_404(MedicalRecord, id=record_id)
+    record = get_object_or_404(MedicalRecord.objects.select_related('patient'), id=record_id)
     
-    if record.patient.user != request.user:
+    if record.patient.user_id != request.user.id:
         return redirect('dashboard')
     
     if request.method == 'POST':
@@ -464,15 +485,30 @@ def doctor_patient_list(request):
         return redirect('dashboard')
     
     doctor = get_object_or_404(DoctorProfile, user=request.user)
-    
-    # Get unique patients for this doctor
-    patients = PatientProfile.objects.filter(
-        appointments__doctor=doctor
-    ).distinct().order_by('user__first_name')
+    query = request.GET.get('q', '').strip()
+    age_band = request.GET.get('age')
+    if age_band not in AGE_BANDS:
+        age_band = None
+    conditions = MedicalTag.VOCABULARY[MedicalTag.CHRONIC_DISEASE]
+    condition = request.GET.get('condition')
+    if condition not in conditions:
+        condition = None
+    
+    # One query per page: age is computed in SQL, and visit count, last visit and next
+    # appointment are correlated subqueries over each listed patient's appointments
+    # with this doctor, each a lookup on the (patient, doctor, date) index
+    patients = paginate_keyset(
+        request, doctor_patients(doctor, date.today(), query, age_band, condition), PATIENT_LIST_ORDERING
+    )
     
     context = {
         'patients': patients,
         'doctor': doctor,
+        'query': query,
+        'age_bands': AGE_BANDS,
+        'selected_age_band': age_band,
+        'conditions': conditions,
+        'selected_condition': condition,
     }
     
     return render(request, 'doctor/patient_list.html', context)
@@ -484,7 +520,7 @@ def record_checkup(request, patient_id):
         return redirect('dashboard')
     
     doctor = get_object_or_404(DoctorProfile, user=request.user)
-    patient = get_object_or_404(PatientProfile, id=patient_id)
+    patient = get_object_or_404(PatientProfile.objects.select_related('user'), id=patient_id)
     
     # Verify this doctor has seen this patient
     has_appointment = Appointment.objects.filter(
@@ -535,13 +571,17 @@ def record_checkup(request, patient_id):
 
 @login_required
 def checkup_detail(request, checkup_id):
-    checkup = get_object_or_404(Checkup, id=checkup_id)
+    # The template lists the prescriptions twice; prefetching runs that query once
+    checkup = get_object_or_404(
+        Checkup.objects.select_related('patient__user', 'doctor__user').prefetch_related('prescriptions'),
+        id=checkup_id
+    )
     
     if request.user.role == 'patient':
-        if checkup.patient.user != request.user:
+        if checkup.patient.user_id != request.user.id:
             return redirect('dashboard')
     elif request.user.role == 'doctor':
-        if checkup.doctor.user != request.user:
+        if checkup.doctor.user_id != request.user.id:
             return redirect('dashboard')
     else:
         return redirect('dashboard')
@@ -564,9 +604,9 @@ def add_prescription(request, checkup_id):
     if request.user.role != 'doctor':
         return redirect('dashboard')
     
-    checkup = get_object_or_404(Checkup, id=checkup_id)
+    checkup = get_object_or_404(Checkup.objects.select_related('patient', 'doctor'), id=checkup_id)
     
-    if checkup.doctor.user != request.user:
+    if checkup.doctor.user_id != request.user.id:
         return redirect('dashboard')
     
     if request.method == 'POST':
@@ -609,7 +649,7 @@ def add_prescription(request, checkup_id):
 def prescriptions_list(request):
     if request.user.role == 'patient':
         patient = get_object_or_404(PatientProfile, user=request.user)
-        prescriptions = patient.prescriptions.all().order_by('-created_at')
+        prescriptions = paginate_keyset(request, patient.prescriptions.select_related('doctor__user'), ('-created_at', 'id'))
         
         context = {
             'prescriptions': prescriptions,
@@ -628,13 +668,18 @@ def medications_list(request):
     patient = request.user.patient_profile
     status_filter = request.GET.get('status')
     
-    medications = Medication.objects.filter(patient=patient).order_by('-start_date')
+    medications = Medication.objects.filter(patient=patient)
+    
+    # Totals for the filter tabs in one grouped query
+    medication_counts = dict(medications.values_list('status').annotate(n=Count('id')).order_by())
+    medication_counts['all'] = sum(medication_counts.values())
     
     if status_filter:
         medications = medications.filter(status=status_filter)
         
     context = {
-        'medications': medications,
+        'medications': paginate_keyset(request, medications, ('-start_date', 'id')),
+        'medication_counts': medication_counts,
         'selected_status': status_filter,
     }
     
@@ -646,9 +691,9 @@ def edit_medication(request, medication_id):
     if request.user.role != 'patient':
         return redirect('dashboard')
     
-    medication = get_object_or_404(Medication, id=medication_id)
+    medication = get_object_or_404(Medication.objects.select_related('patient'), id=medication_id)
     
-    if medication.patient.user != request.user:
+    if medication.patient.user_id != request.user.id:
         return redirect('dashboard')
     
     if request.method == 'POST':
@@ -673,7 +718,7 @@ def doctor_patient_detail(request, patient_id):
         return redirect('dashboard')
     
     doctor = get_object_or_404(DoctorProfile, user=request.user)
-    patient = get_object_or_404(PatientProfile, id=patient_id)
+    patient = get_object_or_404(PatientProfile.objects.select_related('user', 'medical_form'), id=patient_id)
     
     # Check if doctor has ever had an appointment with this patient
     has_access = Appointment.objects.filter(doctor=doctor, patient=patient).exists()
@@ -681,32 +726,11 @@ def doctor_patient_detail(request, patient_id):
     if not has_access:
         # Redirect if no access
         return redirect('doctor_patients_list')
-        
-    # Gather all data
-    medical_form = getattr(patient, 'medical_form', None)
-    medical_records = patient.medical_records.all()
-    checkups = patient.checkups.filter(doctor=doctor).order_by('-created_at')
-    prescriptions = patient.prescriptions.filter(doctor=doctor).order_by('-created_at')
-    
-    # Process medical form data for template
-    medical_data = None
-    if medical_form:
-        medical_data = {
-            'has_chronic_diseases': medical_form.has_chronic_diseases,
-            'chronic_diseases': [d.strip() for d in medical_form.chronic_diseases.split(',') if d.strip()] if medical_form.chronic_diseases else [],
-            'has_allergies': medical_form.has_allergies,
-            'allergies': medical_form.allergies,
-            'vaccines': [v.strip() for v in medical_form.vaccines.split(',') if v.strip()] if medical_form.vaccines else [],
-            'has_family_history': medical_form.has_family_history,
-            'family_history': [f.strip() for f in medical_form.family_history.split(',') if f.strip()] if medical_form.family_history else [],
-        }
-
+    
+    # Medical form, records and this doctor's checkups, cached until any of them changes
     context = {
         'patient': patient,
-        'medical_form': medical_data,
-        'medical_records': medical_records,
-        'checkups': checkups,
-        'prescriptions': prescriptions,
+        **load_patient_chart(patient, doctor),
     }
     
     return render(request, 'doctor/patient_detail.html', context)
@@ -734,8 +758,6 @@ def chatbot(request):
     return render(request, 'chatbot.html', context)
 
 
-from .utils import predict_disease
-
 def handle_chatbot_query(message, user):
     """Advanced chatbot query handler"""
     
@@ -744,17 +766,8 @@ def handle_chatbot_query(message, user):
         return f"Hello {user.first_name}! 👋 I'm MediConnect Assistant. How can I help you today?"
     
     # Symptom Analysis (Keyword detection for prediction)
-    # Check if message contains multiple symptoms
-    detected_symptoms = []
-    # This matches symptoms from our list (simple contains check)
-    from .utils import DISEASE_PATTERNS
-    all_symptoms = set()
-    for pattern in DISEASE_PATTERNS.values():
-        all_symptoms.update(pattern)
-        
-    for s in all_symptoms:
-        if s.replace('_', ' ') in message or s in message:
-            detected_symptoms.append(s)
+    # Single pass over the message with the prebuilt symptom automaton
+    detected_symptoms = extract_symptoms(message)
             
     if len(detected_symptoms) >= 2:
         predictions = predict_disease(detected_symptoms)
@@ -802,14 +815,18 @@ def update_appointment_status(request, appointment_id, new_status):
     if request.user.role != 'doctor':
         return redirect('dashboard')
         
-    appointment = get_object_or_404(Appointment, id=appointment_id)
-    if appointment.doctor.user != request.user:
+    appointment = get_object_or_404(Appointment.objects.select_related('doctor'), id=appointment_id)
+    if appointment.doctor.user_id != request.user.id:
         return redirect('dashboard')
         
     if new_status in dict(Appointment.STATUS_CHOICES):
         appointment.status = new_status
-        appointment.save()
-        messages.success(request, f"Appointment updated to {appointment.get_status_display()}")
+        try:
+            save_appointment(appointment)
+            messages.success(request, f"Appointment updated to {appointment.get_status_display()}")
+        except SlotTaken:
+            # Reactivating into a slot that has since been booked by someone else
+            messages.error(request, SLOT_TAKEN_MESSAGE)
         
     return redirect('doctor_appointments_list')
 
@@ -872,53 +889,217 @@ def edit_doctor_profile(request):
     return render(request, 'doctor/edit_profile.html', {'doctor': doctor, 'user': request.user})
 
 # AJAX API endpoints
+# Longest range the availability range endpoint will compute in one call
+MAX_AVAILABILITY_DAYS = 31
+DOCTOR_SEARCH_PAGE_SIZE = 20
+
+
+@login_required
+def search_doctors(request):
+    """Doctor autocomplete: ?q= name prefix(es), ?specialization= prefix, ?page= (1-based)"""
+    query = request.GET.get('q', '').strip()
+    specialization = request.GET.get('specialization', '').strip()
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        return JsonResponse({'error': 'page must be an integer'}, status=400)
+    
+    doctors = DoctorProfile.objects.select_related('user').only(
+        'id', 'specialization', 'clinic_name', 'user__first_name', 'user__last_name'
+    )
+    # Every word must start a first or last name: "gre ho" finds Gregory House
+    for term in query.split()[:3]:
+        doctors = doctors.filter(Q(user__first_name__istartswith=term) | Q(user__last_name__istartswith=term))
+    if specialization:
+        doctors = doctors.filter(specialization__istartswith=specialization)
+    doctors = doctors.order_by('user__last_name', 'user__first_name', 'id')
+    
+    # One extra row tells us whether there is a next page without a COUNT query
+    offset = (page - 1) * DOCTOR_SEARCH_PAGE_SIZE
+    rows = list(doctors[offset:offset + DOCTOR_SEARCH_PAGE_SIZE + 1])
+    
+    return JsonResponse({
+        'results': [
+            {
+                'id': doctor.id,
+                'name': f"Dr. {doctor.user.first_name} {doctor.user.last_name}",
+                'specialization': doctor.specialization,
+                'clinic_name': doctor.clinic_name,
+            }
+            for doctor in rows[:DOCTOR_SEARCH_PAGE_SIZE]
+        ],
+        'page': page,
+        'has_next': len(rows) > DOCTOR_SEARCH_PAGE_SIZE,
+    })
+
+
 @login_required
 def get_doctor_availability(request, doctor_id):
     """Get available time slots for a doctor"""
-    doctor = get_object_or_404(DoctorProfile, id=doctor_id)
+    doctor = get_object_or_404(DoctorProfile.objects.select_related('schedule'), id=doctor_id)
     appointment_date = request.GET.get('date')
     
     if not appointment_date:
         return JsonResponse({'error': 'Date is required'}, status=400)
     
-    # Get existing appointments for this doctor on this date
-    existing_appointments = Appointment.objects.filter(
-        doctor=doctor,
-        date=appointment_date,
-        status__in=['scheduled', 'confirmed']
-    ).values_list('time', flat=True)
-    
-    # Generate time slots (30-minute intervals from 9 AM to 5 PM)
-    time_slots = []
-    current_time = datetime.strptime('09:00', '%H:%M')
-    end_time = datetime.strptime('17:00', '%H:%M')
-    
-    while current_time <= end_time:
-        time_str = current_time.strftime('%H:%M')
-        # Check if slot is already taken
-        is_taken = False
-        for taken_time in existing_appointments:
-            # Simple string comparison might fail if formats differ, ensuring consistent comparison
-            if str(taken_time)[:5] == time_str:
-                is_taken = True
-                break
-        
-        if not is_taken:
-            time_slots.append(time_str)
-            
-        current_time += timedelta(minutes=30)
+    try:
+        appointment_date = date.fromisoformat(appointment_date)
+    except ValueError:
+        return JsonResponse({'error': 'Date must be YYYY-MM-DD'}, status=400)
     
+    time_slots = get_available_slots(doctor, [appointment_date])[appointment_date]
     return JsonResponse({'time_slots': time_slots})
 
 
+@login_required
+def get_doctor_availability_range(request, doctor_id):
+    """Get available time slots for a doctor for `days` consecutive days from `start`"""
+    doctor = get_object_or_404(DoctorProfile.objects.select_related('schedule'), id=doctor_id)
+    
+    try:
+        start = date.fromisoformat(request.GET.get('start', ''))
+    except ValueError:
+        return JsonResponse({'error': 'start is required as YYYY-MM-DD'}, status=400)
+    
+    try:
+        days = int(request.GET.get('days', 7))
+    except ValueError:
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    if not 1 <= days <= MAX_AVAILABILITY_DAYS:
+        return JsonResponse({'error': f'days must be between 1 and {MAX_AVAILABILITY_DAYS}'}, status=400)
+    
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    slots = get_available_slots(doctor, dates)
+    
+    return JsonResponse({
+        'start': start.isoformat(),
+        'days': days,
+        'availability': {day.isoformat(): time_slots for day, time_slots in slots.items()},
+    })
+
+
+@login_required
+@gzip_page
+@require_http_methods(['GET', 'POST'])
+def predict_symptoms(request):
+    """Rank diseases for a symptom list (GET ?symptoms=a&symptoms=b or POST JSON {"symptoms": [...]})"""
+    if request.method == 'POST':
+        try:
+            symptoms = json.loads(request.body or b'{}').get('symptoms', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    else:
+        symptoms = request.GET.getlist('symptoms')
+    
+    if not isinstance(symptoms, list) or not symptoms:
+        return JsonResponse({'error': 'At least one symptom is required'}, status=400)
+    
+    if len(symptoms) > len(SYMPTOMS):
+        return JsonResponse({'error': 'Too many symptoms'}, status=400)
+    
+    unknown = [s for s in symptoms if not isinstance(s, str) or s not in KNOWN_SYMPTOMS]
+    if unknown:
+        return JsonResponse({'error': 'Unknown symptoms', 'unknown_symptoms': unknown}, status=400)
+    
+    return JsonResponse({'predictions': predict_disease(symptoms)})
+
+
+@staff_member_required
+def prediction_cache_stats(request):
+    """Size, hit, miss and eviction counters of this worker's prediction cache"""
+    return JsonResponse(prediction_cache.stats())
+
+
+@staff_member_required
+def doctor_stats_report(request):
+    """Per doctor totals from the daily rollup: ?start=&end= (YYYY-MM-DD), optional ?doctor= ids"""
+    try:
+        start = date.fromisoformat(request.GET.get('start', ''))
+        end = date.fromisoformat(request.GET.get('end', ''))
+    except ValueError:
+        return JsonResponse({'error': 'start and end are required as YYYY-MM-DD'}, status=400)
+    if end < start:
+        return JsonResponse({'error': 'end must not be before start'}, status=400)
+    
+    try:
+        doctor_ids = [int(doctor_id) for doctor_id in request.GET.getlist('doctor')] or None
+    except ValueError:
+        return JsonResponse({'error': 'doctor must be an integer id'}, status=400)
+    
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'doctors': list(daily_stats_report(start, end, doctor_ids)),
+    })
+
+
+@staff_member_required
+def cohort_report(request):
+    """Ids of the patients matching ?spec=<cohort spec JSON> (see cohorts.py), with the query time"""
+    try:
+        spec = json.loads(request.GET.get('spec', ''))
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'spec is required as a JSON object'}, status=400)
+    
+    start = time.perf_counter()
+    try:
+        patient_ids = list(cohort_patient_ids(spec))
+    except CohortSpecError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    return JsonResponse({
+        'count': len(patient_ids),
+        'patient_ids': patient_ids,
+        'elapsed_ms': round(elapsed_ms, 1),
+    })
+
+
 # Messaging Views
 @login_required
 def inbox(request):
-    received_messages = Message.objects.filter(recipient=request.user).order_by('-created_at')
-    sent_messages = Message.objects.filter(sender=request.user).order_by('-created_at')
+    # One row per conversation, newest first, straight off the (user, last_message_at) index
+    conversations = paginate_keyset(
+        request,
+        request.user.conversation_memberships.select_related('other_user', 'conversation__last_message'),
+        CONVERSATION_ORDERING
+    )
     return render(request, 'messaging/inbox.html', {
-        'received_messages': received_messages,
-        'sent_messages': sent_messages
+        'conversations': conversations,
+    })
+
+
+@login_required
+def conversation_detail(request, conversation_id):
+    membership = get_object_or_404(
+        ConversationParticipant.objects.select_related('conversation', 'other_user'),
+        conversation_id=conversation_id, user=request.user
+    )
+    conversation = membership.conversation
+    
+    if request.method == 'POST':
+        body = request.POST.get('body', '').strip()
+        if body:
+            Message.objects.create(
+                conversation=conversation,
+                sender=request.user,
+                recipient=membership.other_user,
+                subject=request.POST.get('subject', ''),
+                body=body
+            )
+            return redirect('conversation_detail', conversation_id=conversation.id)
+        messages.error(request, "Message cannot be empty.")
+    
+    if membership.unread_count:
+        mark_conversation_read(conversation, request.user)
+    
+    thread = paginate_keyset(
+        request, conversation.messages.select_related('sender'), MESSAGE_ORDERING
+    )
+    return render(request, 'messaging/conversation.html', {
+        'conversation': conversation,
+        'other_user': membership.other_user,
+        'thread': thread,
     })
 
 @login_required
@@ -930,14 +1111,14 @@ def send_message(request):
         
         recipient = get_object_or_404(CustomUser, id=recipient_id)
         
-        Message.objects.create(
+        message = Message.objects.create(
             sender=request.user,
             recipient=recipient,
             subject=subject,
             body=body
         )
         messages.success(request, "Message sent successfully.")
-        return redirect('inbox')
+        return redirect('conversation_detail', conversation_id=message.conversation_id)
     
     # Get potential recipients
     if request.user.role == 'patient':
@@ -950,3 +1131,21 @@ def send_message(request):
         recipients = CustomUser.objects.filter(id__in=patient_ids)
         
     return render(request, 'messaging/send_message.html', {'recipients': recipients})
+
+
+async def message_stream(request):
+    """Server-Sent Events: new messages and unread counts for the signed-in user (serve under ASGI)"""
+    if not live_messages_enabled(request):
+        # Under WSGI the stream would tie up a worker and deliver nothing; 204 stops EventSource retrying
+        return HttpResponse(status=204)
+    
+    # login_required is not async-aware in Django 4.2; resolving the user hits the session store
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    response = StreamingHttpResponse(stream_events(user.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
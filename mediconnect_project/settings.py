@@ -42,17 +42,23 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'mediconnect_app.context_processors.live_messages',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'mediconnect_project.wsgi.application'
+ASGI_APPLICATION = 'mediconnect_project.asgi.application'
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # A file rather than SQLite's shared in-memory test database, so threads in
+        # the booking concurrency tests queue on the write lock instead of failing
+        # with "database table is locked"
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
     }
 }
 
@@ -85,9 +91,45 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Medical record uploads: largest single file, and total bytes a patient may keep
+MEDICAL_RECORD_MAX_FILE_SIZE = 20 * 1024 * 1024
+MEDICAL_RECORD_PATIENT_QUOTA = 200 * 1024 * 1024
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'mediconnect_app.CustomUser'
 
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
+
+# Max entries in the per-process symptom prediction LRU cache (0 disables it)
+PREDICTION_CACHE_SIZE = 1024
+
+# Disease prediction backend: 'patterns' (DISEASE_PATTERNS heuristic) or 'naive_bayes'
+DISEASE_PREDICTION_BACKEND = 'patterns'
+
+# Artifact written by 'manage.py train_disease_model' and read by the naive_bayes backend
+DISEASE_MODEL_PATH = os.path.join(BASE_DIR, 'disease_model.npz')
+
+# Fill Checkup.predicted_disease on a background thread after save (False runs it inline on commit)
+CHECKUP_PREDICTION_ASYNC = True
+
+# Availability and dashboard caches. LocMemCache is per process: with several
+# worker processes use a shared backend (Redis/Memcached) so invalidation
+# reaches every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mediconnect',
+    }
+}
+
+# Live message stream (/api/messages/stream/, served under ASGI). 'local' pushes
+# messages sent in this process; 'database' follows new Message rows with one
+# query per process every LIVE_MESSAGES_POLL_SECONDS, for multi-process deployments.
+# None turns live delivery off. Pages only open the stream when served under ASGI.
+LIVE_MESSAGES_BACKEND = 'local'
+LIVE_MESSAGES_POLL_SECONDS = 2
+# Streams are closed after this long and the browser reconnects, so servers that
+# do not report disconnects never hold a dead client for more than this
+LIVE_MESSAGES_MAX_STREAM_SECONDS = 300